@@ -0,0 +1,101 @@
+"""Benchmark: /tasks/export throughput and memory
+
+Two modes:
+
+- encode (default): encode synthetic rows in export-sized chunks without a
+  database, to show the encoder alone clears the 100k rows/s target
+- http: stream a real export from a running stack and count rows per second
+  while reading the body incrementally
+
+    python benchmarks/export_throughput.py --rows 1000000
+    python benchmarks/export_throughput.py --mode http --url http://localhost
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web"))
+
+from export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, encode_stream  # noqa: E402
+
+TARGET_ROWS_PER_SECOND = 100_000
+
+
+def synthetic_chunks(rows, chunk_size):
+    statuses = ("pending", "completed", "archived")
+    for start in range(0, rows, chunk_size):
+        end = min(rows, start + chunk_size)
+        yield [
+            (i, f"Task number {i} with some text", statuses[i % 3])
+            for i in range(start + 1, end + 1)
+        ]
+
+
+def bench_encode(export_format, rows, chunk_size):
+    started = time.perf_counter()
+    total_bytes = 0
+    for data in encode_stream(
+        EXPORT_FORMATS[export_format](), synthetic_chunks(rows, chunk_size)
+    ):
+        total_bytes += len(data)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return rows / elapsed, total_bytes, peak
+
+
+def bench_http(url, export_format, status):
+    params = {"format": export_format}
+    if status:
+        params["status"] = status
+    started = time.perf_counter()
+    total_bytes = 0
+    newlines = 0
+    with requests.get(f"{url}/tasks/export", params=params, stream=True) as response:
+        response.raise_for_status()
+        for data in response.iter_content(chunk_size=64 * 1024):
+            total_bytes += len(data)
+            newlines += data.count(b"\n")
+    elapsed = time.perf_counter() - started
+    rows = newlines - (1 if export_format == "csv" else 0)
+    if export_format == "arrow":
+        rows = 0  # not line based; report bytes only
+    return rows, total_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("encode", "http"), default="encode")
+    parser.add_argument("--format", default="ndjson", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--url", default="http://localhost")
+    parser.add_argument("--status")
+    args = parser.parse_args()
+
+    if args.mode == "encode":
+        rate, total_bytes, peak = bench_encode(args.format, args.rows, args.chunk_size)
+        print(
+            f"{args.format}: {rate:,.0f} rows/s, {total_bytes / 1e6:.1f} MB encoded, "
+            f"peak RSS {peak / 1e6:.1f} MB"
+        )
+    else:
+        rows, total_bytes, elapsed = bench_http(args.url, args.format, args.status)
+        rate = rows / elapsed if elapsed else 0.0
+        print(
+            f"{args.format}: {rows:,} rows, {total_bytes / 1e6:.1f} MB in "
+            f"{elapsed:.2f}s ({rate:,.0f} rows/s)"
+        )
+
+    if args.format != "arrow" and rate < TARGET_ROWS_PER_SECOND:
+        print(f"below target of {TARGET_ROWS_PER_SECOND:,} rows/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark: /tasks/next query plan and latency at 1M rows
+
+Loads --rows tasks for one bench owner with a spread of statuses, priorities
+and due dates, then:
+
+- checks EXPLAIN for the /tasks/next query reads idx_owner_next without a
+  filesort (exits non-zero otherwise)
+- times the query as the route runs it, and again with the index ignored so
+  MySQL has to sort every pending row of the owner
+
+    docker-compose run --rm -v "$PWD:/src" web \\
+        python /src/benchmarks/next_tasks.py \\
+        --host db --user root --password root --rows 1000000
+
+The bench owner's rows are deleted afterwards unless --keep is given.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+
+import mysql.connector
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web"))
+
+import statements as sql  # noqa: E402
+from fields import MAX_PRIORITY, NO_DUE_DATE  # noqa: E402
+
+OWNER = "bench-next"
+INDEX = "idx_owner_next"
+INSERT_CHUNK = 5000
+FILESORT_QUERY = sql.SELECT_NEXT_TASKS.replace(
+    "FROM todos", f"FROM todos IGNORE INDEX ({INDEX})"
+)
+
+
+def generate_rows(rows, seed=1):
+    """Rows of (owner, task, status, priority, due_at); a third have no due date"""
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    statuses = ("pending", "pending", "completed", "archived")
+    for i in range(rows):
+        due_at = NO_DUE_DATE
+        if rnd.random() < 0.66:
+            due_at = start + timedelta(minutes=rnd.randrange(525_600))
+        yield (
+            OWNER,
+            f"Bench task {i}",
+            rnd.choice(statuses),
+            rnd.randint(0, MAX_PRIORITY),
+            due_at,
+        )
+
+
+def insert_chunk(cursor, chunk):
+    prefix = sql.INSERT_TASK.split(" VALUES ")[0]
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+    cursor.execute(f"{prefix} VALUES {values}", list(chain.from_iterable(chunk)))
+
+
+def load(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM todos WHERE owner_id = %s", (OWNER,))
+    conn.commit()
+    started = time.perf_counter()
+    chunk = []
+    for row in generate_rows(rows):
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            insert_chunk(cursor, chunk)
+            conn.commit()
+            chunk = []
+    if chunk:
+        insert_chunk(cursor, chunk)
+        conn.commit()
+    cursor.execute("ANALYZE TABLE todos")
+    cursor.fetchall()
+    cursor.close()
+    print(f"loaded {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+def explain(conn, query, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, params)
+    plan = cursor.fetchall()
+    cursor.close()
+    return plan
+
+
+def time_query(conn, query, params, runs):
+    cursor = conn.cursor()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    timings.sort()
+    return (
+        statistics.median(timings),
+        timings[min(len(timings) - 1, int(0.99 * len(timings)))],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("DB_HOST", "localhost"))
+    parser.add_argument("--user", default=os.environ.get("DB_USER", "user"))
+    parser.add_argument("--password", default=os.environ.get("DB_PASSWORD", "pass"))
+    parser.add_argument("--database", default=os.environ.get("DB_NAME", "todo"))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(
+        host=args.host,
+        user=args.user,
+        password=args.password,
+        database=args.database,
+    )
+    if not args.skip_load:
+        load(conn, args.rows)
+
+    params = (OWNER, args.n)
+    plan = explain(conn, sql.SELECT_NEXT_TASKS, params)
+    for row in plan:
+        print(
+            f"plan: key={row['key']} type={row['type']} rows={row['rows']} extra={row['Extra']}"
+        )
+    uses_index = any(row["key"] == INDEX for row in plan)
+    filesort = any("filesort" in (row["Extra"] or "") for row in plan)
+
+    indexed = time_query(conn, sql.SELECT_NEXT_TASKS, params, args.runs)
+    # The filesort variant reads every pending row, so fewer runs suffice
+    sorted_ = time_query(conn, FILESORT_QUERY, params, max(1, args.runs // 20))
+    print(f"index range scan: median {indexed[0]:8.2f} ms   p99 {indexed[1]:8.2f} ms")
+    print(f"filesort:         median {sorted_[0]:8.2f} ms   p99 {sorted_[1]:8.2f} ms")
+    if indexed[0]:
+        print(f"speedup: {sorted_[0] / indexed[0]:.0f}x")
+
+    if not args.keep:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM todos WHERE owner_id = %s", (OWNER,))
+        conn.commit()
+        cursor.close()
+    conn.close()
+
+    if not uses_index or filesort:
+        print(f"/tasks/next does not read {INDEX} without a filesort")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
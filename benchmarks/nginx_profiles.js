@@ -0,0 +1,42 @@
+// k6 load for benchmarks/nginx_profiles.py: mostly hot /tasks reads spread
+// over a few owners, with a trickle of writes
+import http from 'k6/http';
+import { check } from 'k6';
+import { Rate } from 'k6/metrics';
+
+const BASE_URL = __ENV.BASE_URL || 'http://localhost';
+const OWNERS = ['bench-a', 'bench-b', 'bench-c', 'bench-d'];
+const READS = ['/tasks', '/tasks?status=pending', '/tasks/next?n=10', '/tasks/stats'];
+
+const cacheHits = new Rate('micro_cache_hits');
+
+export const options = {
+  vus: Number(__ENV.VUS || 50),
+  duration: __ENV.DURATION || '30s',
+  thresholds: {
+    http_req_failed: ['rate<0.01'],
+    // Also makes k6 report read and write latency separately
+    'http_req_duration{kind:read}': ['p(95)<1000'],
+    'http_req_duration{kind:write}': ['p(95)<1000'],
+  },
+};
+
+export default function () {
+  const owner = OWNERS[Math.floor(Math.random() * OWNERS.length)];
+  const headers = { 'X-Owner-Id': owner };
+
+  if (Math.random() < 0.05) {
+    const res = http.post(
+      `${BASE_URL}/add`,
+      JSON.stringify({ task: `Bench task ${Date.now()}` }),
+      { headers: Object.assign({ 'Content-Type': 'application/json' }, headers), tags: { kind: 'write' } },
+    );
+    check(res, { 'add status 201': (r) => r.status === 201 });
+    return;
+  }
+
+  const path = READS[Math.floor(Math.random() * READS.length)];
+  const res = http.get(`${BASE_URL}${path}`, { headers, tags: { kind: 'read' } });
+  check(res, { 'read status 200': (r) => r.status === 200 });
+  cacheHits.add(['HIT', 'STALE', 'UPDATING'].includes(res.headers['X-Cache-Status']));
+}
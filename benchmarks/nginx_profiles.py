@@ -0,0 +1,127 @@
+"""Benchmark: nginx/default.conf vs the scale-out profile
+
+For each profile, brings the stack up with docker-compose, runs the k6 load in
+nginx_profiles.js through nginx, tears the stack down and prints throughput,
+read/write latency and the micro-cache hit ratio side by side:
+
+- default:   docker-compose.yml (one Flask dev server, a connection per request)
+- scale-out: plus docker-compose.scale.yml (3 gunicorn replicas, upstream
+             keepalive, 1s micro-cache of /tasks reads)
+
+    python benchmarks/nginx_profiles.py --vus 50 --duration 30s
+
+Needs docker-compose and k6 on the PATH and port 80 free. With --no-stack it
+only runs k6 against --url, for a stack that is already up.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nginx_profiles.js")
+PROFILES = {
+    "default": ["docker-compose.yml"],
+    "scale-out": ["docker-compose.yml", "docker-compose.scale.yml"],
+}
+TREND_STATS = "med,p(95),p(99)"
+
+
+def compose(files, *args):
+    command = ["docker-compose"]
+    for name in files:
+        command += ["-f", os.path.join(ROOT, name)]
+    subprocess.run(command + list(args), cwd=ROOT, check=True)
+
+
+def run_k6(url, vus, duration):
+    """Run the k6 script and return its exported summary metrics"""
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = os.path.join(tmp, "summary.json")
+        subprocess.run(
+            [
+                "k6",
+                "run",
+                "--quiet",
+                "--summary-trend-stats",
+                TREND_STATS,
+                "--summary-export",
+                summary,
+                "-e",
+                f"BASE_URL={url}",
+                "-e",
+                f"VUS={vus}",
+                "-e",
+                f"DURATION={duration}",
+                SCRIPT,
+            ],
+            check=False,  # a failed threshold still leaves a summary to report
+        )
+        with open(summary) as f:
+            return json.load(f)["metrics"]
+
+
+def summarize(metrics):
+    def trend(name, stat):
+        return metrics.get(name, {}).get(stat, 0.0)
+
+    return {
+        "req/s": metrics["http_reqs"]["rate"],
+        "read p50 ms": trend("http_req_duration{kind:read}", "med"),
+        "read p99 ms": trend("http_req_duration{kind:read}", "p(99)"),
+        "write p99 ms": trend("http_req_duration{kind:write}", "p(99)"),
+        "failed": metrics["http_req_failed"]["value"],
+        "cache hits": metrics.get("micro_cache_hits", {}).get("value", 0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=sorted(PROFILES),
+        default=["default", "scale-out"],
+    )
+    parser.add_argument("--url", default="http://localhost")
+    parser.add_argument("--vus", type=int, default=50)
+    parser.add_argument("--duration", default="30s")
+    parser.add_argument("--no-stack", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for profile in args.profiles:
+        files = PROFILES[profile]
+        if not args.no_stack:
+            compose(files, "up", "-d", "--build", "--wait")
+        try:
+            results[profile] = summarize(run_k6(args.url, args.vus, args.duration))
+        finally:
+            if not args.no_stack:
+                compose(files, "down")
+
+    columns = list(next(iter(results.values())))
+    print(f"{'profile':<10}" + "".join(f"{column:>14}" for column in columns))
+    for profile, result in results.items():
+        print(
+            f"{profile:<10}" + "".join(f"{result[column]:>14.2f}" for column in columns)
+        )
+
+    if "default" in results and "scale-out" in results:
+        before, after = results["default"], results["scale-out"]
+        if before["req/s"]:
+            print(f"throughput: {after['req/s'] / before['req/s']:.1f}x")
+        if after["read p99 ms"]:
+            print(
+                f"read p99: {before['read p99 ms'] / after['read p99 ms']:.1f}x lower"
+            )
+
+    if any(result["failed"] >= 0.01 for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark: text SQL vs cached server-side prepared statements
+
+Runs the fixed per-request statement mix used by the routes (insert, select by
+id, update status, delete, paged select) N times over one connection, once
+with plain text cursors and once through the app's StatementCache, and reports
+per-request CPU on both sides:
+
+- app: process CPU time of this client (time.process_time)
+- db:  delta of SUM_CPU_TIME / SUM_TIMER_WAIT across
+       performance_schema.events_statements_summary_global_by_event_name
+
+Run against an otherwise idle database with a user that can read
+performance_schema, e.g.:
+
+    docker-compose run --rm -v "$PWD:/src" web \\
+        python /src/benchmarks/prepared_statements.py \\
+        --host db --user root --password root --requests 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web"))
+
+import statements as sql  # noqa: E402
+from fields import DEFAULT_PRIORITY, NO_DUE_DATE  # noqa: E402
+from statements import StatementCache  # noqa: E402
+
+SERVER_TOTALS = (
+    "SELECT SUM(SUM_CPU_TIME), SUM(SUM_TIMER_WAIT) "
+    "FROM performance_schema.events_statements_summary_global_by_event_name"
+)
+
+
+def server_totals(conn):
+    """Server-side statement CPU and wall time so far, in picoseconds"""
+    cursor = conn.cursor()
+    cursor.execute(SERVER_TOTALS)
+    cpu, wait = cursor.fetchone()
+    cursor.close()
+    return int(cpu or 0), int(wait or 0)
+
+
+OWNER = "bench"
+NEW_TASK = (OWNER, "bench task", "pending", DEFAULT_PRIORITY, NO_DUE_DATE)
+
+
+def one_request_text(conn):
+    cursor = conn.cursor()
+    cursor.execute(sql.INSERT_TASK, NEW_TASK)
+    task_id = cursor.lastrowid
+    cursor.execute(sql.SELECT_TASK_ID, (OWNER, task_id))
+    cursor.fetchall()
+    cursor.execute(sql.UPDATE_TASK_STATUS, ("completed", OWNER, task_id))
+    cursor.execute(sql.SELECT_TASK_PAGE, (OWNER, 10, 0))
+    cursor.fetchall()
+    cursor.execute(sql.DELETE_TASK, (OWNER, task_id))
+    conn.commit()
+
+
+def one_request_prepared(conn, cache):
+    task_id = cache.execute(conn, sql.INSERT_TASK, NEW_TASK).lastrowid
+    cache.execute(conn, sql.SELECT_TASK_ID, (OWNER, task_id)).fetchall()
+    cache.execute(conn, sql.UPDATE_TASK_STATUS, ("completed", OWNER, task_id))
+    cache.execute(conn, sql.SELECT_TASK_PAGE, (OWNER, 10, 0)).fetchall()
+    cache.execute(conn, sql.DELETE_TASK, (OWNER, task_id))
+    conn.commit()
+
+
+def run(label, conn, stats_conn, requests, step):
+    step()  # warm up (prepares statements on the first pass)
+    db_cpu_0, db_wait_0 = server_totals(stats_conn)
+    cpu_0, wall_0 = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        step()
+    cpu_1, wall_1 = time.process_time(), time.perf_counter()
+    db_cpu_1, db_wait_1 = server_totals(stats_conn)
+
+    result = {
+        "app_cpu_us": (cpu_1 - cpu_0) / requests * 1e6,
+        "db_cpu_us": (db_cpu_1 - db_cpu_0) / requests / 1e6,
+        "db_time_us": (db_wait_1 - db_wait_0) / requests / 1e6,
+        "wall_us": (wall_1 - wall_0) / requests * 1e6,
+    }
+    print(
+        f"{label:<10} app cpu {result['app_cpu_us']:8.1f} us/req   "
+        f"db cpu {result['db_cpu_us']:8.1f} us/req   "
+        f"db time {result['db_time_us']:8.1f} us/req   "
+        f"wall {result['wall_us']:8.1f} us/req"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("DB_HOST", "localhost"))
+    parser.add_argument("--user", default=os.environ.get("DB_USER", "user"))
+    parser.add_argument("--password", default=os.environ.get("DB_PASSWORD", "pass"))
+    parser.add_argument("--database", default=os.environ.get("DB_NAME", "todo"))
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    config = {
+        "host": args.host,
+        "user": args.user,
+        "password": args.password,
+        "database": args.database,
+        "consume_results": True,
+    }
+    conn = mysql.connector.connect(**config)
+    stats_conn = mysql.connector.connect(**config)
+    cache = StatementCache()
+
+    text = run("text", conn, stats_conn, args.requests, lambda: one_request_text(conn))
+    prepared = run(
+        "prepared",
+        conn,
+        stats_conn,
+        args.requests,
+        lambda: one_request_prepared(conn, cache),
+    )
+
+    for key, label in (("app_cpu_us", "app CPU"), ("db_cpu_us", "db CPU")):
+        saved = text[key] - prepared[key]
+        pct = saved / text[key] * 100 if text[key] else 0.0
+        print(f"{label} saved per request: {saved:.1f} us ({pct:.1f}%)")
+
+    conn.close()
+    stats_conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: application import and startup time
+
+Runs ``python -X importtime`` on the app module to find the slowest imports,
+then times ``import app; app.create_app()`` in fresh interpreters (what every
+gunicorn worker spawn and container cold start pays). Prints a JSON summary
+and exits non-zero if the median startup is over ``--max-ms``.
+
+Reads itself from stdin so it can run inside the web container, as the
+pipeline does:
+
+    docker-compose exec -T web python - --app-dir /app --max-ms 1000 \\
+        < benchmarks/startup.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_CODE = "import app; app.create_app()"
+
+
+def import_profile(app_dir, top):
+    """Return (total_us, slowest [(cumulative_us, module)]) from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=app_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        cumulative_us = int(cumulative)
+        entries.append((cumulative_us, name.strip()))
+        # Top-level imports are not indented under any parent
+        if not name.startswith("  "):
+            total_us += cumulative_us
+    entries.sort(reverse=True)
+    return total_us, entries[:top]
+
+
+def time_startup(app_dir, runs):
+    """Wall time of a fresh interpreter importing and building the app (ms)"""
+    env = dict(os.environ, LOG_DIR=os.environ.get("LOG_DIR", "/tmp/logs"))
+    baseline = []
+    startup = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=app_dir, check=True)
+        baseline.append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", STARTUP_CODE], cwd=app_dir, env=env, check=True
+        )
+        startup.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(baseline), statistics.median(startup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App startup benchmark")
+    parser.add_argument("--app-dir", help="directory containing app.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+    if args.app_dir is None:
+        args.app_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "web"
+        )
+
+    import_us, slowest = import_profile(args.app_dir, args.top)
+    interpreter_ms, startup_ms = time_startup(args.app_dir, args.runs)
+    summary = {
+        "import_ms": round(import_us / 1000.0, 1),
+        "interpreter_ms": round(interpreter_ms, 1),
+        "startup_ms": round(startup_ms, 1),
+        "app_startup_ms": round(startup_ms - interpreter_ms, 1),
+        "max_ms": args.max_ms,
+        "slowest_imports": [
+            {"module": name, "cumulative_ms": round(us / 1000.0, 1)}
+            for us, name in slowest
+        ],
+    }
+    print(json.dumps(summary, indent=2))
+    if startup_ms > args.max_ms:
+        print(
+            f"Startup {startup_ms:.0f} ms exceeds target {args.max_ms:.0f} ms",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,57 @@
 CREATE TABLE IF NOT EXISTS todos (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    owner_id VARCHAR(64) NOT NULL DEFAULT 'default',
     task VARCHAR(255) NOT NULL,
-    status ENUM('pending', 'completed', 'archived') DEFAULT 'pending',
-    
+    status ENUM('pending', 'completed', 'archived') NOT NULL DEFAULT 'pending',
+    -- 0-9, higher is more urgent
+    priority TINYINT NOT NULL DEFAULT 0,
+    -- No due date is stored as the maximum so undated tasks sort last
+    due_at DATETIME NOT NULL DEFAULT '9999-12-31 23:59:59',
+
     CONSTRAINT chk_task_not_empty CHECK (CHAR_LENGTH(TRIM(task)) > 0),
-    INDEX idx_status (status)
+    CONSTRAINT chk_priority_range CHECK (priority BETWEEN 0 AND 9),
+    -- Every query is scoped to one owner: pages in id order read
+    -- (owner_id, id), status filters read (owner_id, status, id) and
+    -- /tasks/next walks (owner_id, status, priority DESC, due_at, id)
+    INDEX idx_owner_id (owner_id, id),
+    INDEX idx_owner_status_id (owner_id, status, id),
+    INDEX idx_owner_next (owner_id, status, priority DESC, due_at, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Per-owner, per-status totals kept current by triggers in the same
+-- transaction as the write, so /tasks/stats never needs a COUNT(*) scan.
+CREATE TABLE IF NOT EXISTS task_counts (
+    owner_id VARCHAR(64) NOT NULL,
+    status ENUM('pending', 'completed', 'archived') NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_id, status)
+) ENGINE=InnoDB;
+
+INSERT INTO task_counts (owner_id, status, total)
+    SELECT * FROM (
+        SELECT owner_id, status, COUNT(*) AS total FROM todos GROUP BY owner_id, status
+    ) AS counted
+    ON DUPLICATE KEY UPDATE total = counted.total;
+
+-- Rows carry a +1/-1 delta; an owner's first task creates its counter row
+CREATE TRIGGER IF NOT EXISTS trg_todos_count_insert AFTER INSERT ON todos FOR EACH ROW
+    INSERT INTO task_counts (owner_id, status, total)
+    VALUES (NEW.owner_id, NEW.status, 1) AS delta
+    ON DUPLICATE KEY UPDATE total = task_counts.total + delta.total;
+
+CREATE TRIGGER IF NOT EXISTS trg_todos_count_delete AFTER DELETE ON todos FOR EACH ROW
+    UPDATE task_counts SET total = total - 1
+    WHERE owner_id = OLD.owner_id AND status = OLD.status;
+
+-- When neither owner nor status changed both rows hit the same counter and
+-- cancel out. The two counters are always locked in key order, whichever way
+-- the status moved, so concurrent updates cannot deadlock on task_counts.
+CREATE TRIGGER IF NOT EXISTS trg_todos_count_update AFTER UPDATE ON todos FOR EACH ROW
+    INSERT INTO task_counts (owner_id, status, total)
+    SELECT * FROM (
+        SELECT NEW.owner_id AS owner_id, NEW.status AS status, 1 AS total
+        UNION ALL
+        SELECT OLD.owner_id, OLD.status, -1
+    ) AS delta
+    ORDER BY owner_id, status
+    ON DUPLICATE KEY UPDATE total = task_counts.total + delta.total;
@@ -0,0 +1,24 @@
+-- Replace the status-change counter trigger with the one in init.sql, which
+-- locks task_counts rows in key order:
+--
+--   docker-compose exec -T db mysql -uroot -proot todo < db/migrate_count_trigger_order.sql
+--
+-- Status changes made between the DROP and the CREATE are not counted, so the
+-- counters are recomputed afterwards.
+DROP TRIGGER IF EXISTS trg_todos_count_update;
+
+CREATE TRIGGER trg_todos_count_update AFTER UPDATE ON todos FOR EACH ROW
+    INSERT INTO task_counts (owner_id, status, total)
+    SELECT * FROM (
+        SELECT NEW.owner_id AS owner_id, NEW.status AS status, 1 AS total
+        UNION ALL
+        SELECT OLD.owner_id, OLD.status, -1
+    ) AS delta
+    ORDER BY owner_id, status
+    ON DUPLICATE KEY UPDATE total = task_counts.total + delta.total;
+
+INSERT INTO task_counts (owner_id, status, total)
+    SELECT * FROM (
+        SELECT owner_id, status, COUNT(*) AS total FROM todos GROUP BY owner_id, status
+    ) AS counted
+    ON DUPLICATE KEY UPDATE total = counted.total;
@@ -0,0 +1,18 @@
+-- Upgrade a database created before tasks had owners, then re-apply init.sql
+-- to rebuild the per-owner counters and triggers:
+--
+--   docker-compose exec -T db mysql -uroot -proot todo < db/migrate_owner_id.sql
+--   docker-compose exec -T db mysql -uroot -proot todo < db/init.sql
+--
+-- Existing tasks are given to the 'default' owner.
+DROP TRIGGER IF EXISTS trg_todos_count_insert;
+DROP TRIGGER IF EXISTS trg_todos_count_delete;
+DROP TRIGGER IF EXISTS trg_todos_count_update;
+DROP TABLE IF EXISTS task_counts;
+
+ALTER TABLE todos
+    ADD COLUMN owner_id VARCHAR(64) NOT NULL DEFAULT 'default' AFTER id,
+    MODIFY status ENUM('pending', 'completed', 'archived') NOT NULL DEFAULT 'pending',
+    DROP INDEX idx_status,
+    ADD INDEX idx_owner_id (owner_id, id),
+    ADD INDEX idx_owner_status_id (owner_id, status, id);
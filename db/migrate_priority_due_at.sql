@@ -0,0 +1,8 @@
+-- Add task priorities and due dates to a database created before them:
+--
+--   docker-compose exec -T db mysql -uroot -proot todo < db/migrate_priority_due_at.sql
+ALTER TABLE todos
+    ADD COLUMN priority TINYINT NOT NULL DEFAULT 0 AFTER status,
+    ADD COLUMN due_at DATETIME NOT NULL DEFAULT '9999-12-31 23:59:59' AFTER priority,
+    ADD CONSTRAINT chk_priority_range CHECK (priority BETWEEN 0 AND 9),
+    ADD INDEX idx_owner_next (owner_id, status, priority DESC, due_at, id);
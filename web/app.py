@@ -1,59 +1,581 @@
 import os
+import math
+import time
 import logging
+import importlib
+import threading
 from contextlib import contextmanager
-from flask import Flask, request, jsonify
-import mysql.connector
-from mysql.connector import Error as MySQLError
-
-# logging
-log_dir = "/app/logs"
-try:
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-except PermissionError:
-    log_dir = "/tmp/logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
-logging.basicConfig(
-    filename=os.path.join(log_dir, "app.log"),
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s",
+from itertools import chain
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    g,
+    jsonify,
+    request,
+    stream_with_context,
 )
+from batching import InsertBatcher
+from circuit import OPEN, AdaptiveTimeout, CircuitBreaker
+from bulk_import import (
+    BulkImporter,
+    DEFAULT_BATCH_SIZE,
+    IMPORT_FORMATS,
+    records_for,
+)
+from fields import (
+    DEFAULT_PRIORITY,
+    NO_DUE_DATE,
+    format_due_at,
+    parse_due_at,
+    parse_priority,
+)
+from export import EXPORT_FORMATS, encode_stream, export_query, iter_chunks
+from metrics import metrics
+from rendering import INDEX_PAGE, FragmentCache, render_message
+from ratelimit import RateLimiter, AdaptiveConcurrencyLimiter
+import statements as sql
+from statements import statement_cache, TASK_STATUSES
+from taskstore import TaskStore
+from tenancy import DEFAULT_OWNER, OWNER_HEADER, owner_shard, validate_owner
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# The MySQL driver is only imported once a connection is actually needed;
+# use driver.Error wherever mysql.connector.Error would be caught
+driver = LazyModule("mysql.connector")
+
+
+class LazyFileHandler(logging.FileHandler):
+    """Log file handler that creates its directory on the first record
+
+    Falls back to /tmp/logs when the configured directory cannot be created.
+    """
+
+    def __init__(self, log_dir, filename="app.log", fallback_dir="/tmp/logs"):
+        self.filename = filename
+        self.fallback_dir = fallback_dir
+        super().__init__(os.path.join(log_dir, filename), delay=True)
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        except PermissionError:
+            os.makedirs(self.fallback_dir, exist_ok=True)
+            self.baseFilename = os.path.join(self.fallback_dir, self.filename)
+        return super()._open()
+
+
+def configure_logging(log_dir):
+    """Send app logs to <log_dir>/app.log (no filesystem work until used)"""
+    logging.basicConfig(
+        handlers=[LazyFileHandler(log_dir)],
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+    )
+
+
+def parse_flag(value):
+    """Interpret an environment or query-string value as a boolean"""
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_flag(name, default=False):
+    """Read a boolean feature flag from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return parse_flag(value)
+
+
+def env_list(name):
+    """Read a comma-separated list from the environment"""
+    return [
+        item.strip() for item in os.environ.get(name, "").split(",") if item.strip()
+    ]
+
+
+def load_config():
+    """Default settings, read from the environment"""
+    return dict(
+        LOG_DIR=os.environ.get("LOG_DIR", "/app/logs"),
+        DEFAULT_OWNER=os.environ.get("DEFAULT_OWNER", DEFAULT_OWNER),
+        DB_HOST=os.environ.get("DB_HOST"),
+        DB_SHARD_HOSTS=env_list("DB_SHARD_HOSTS"),
+        DB_USER=os.environ.get("DB_USER"),
+        DB_PASSWORD=os.environ.get("DB_PASSWORD"),
+        DB_NAME=os.environ.get("DB_NAME"),
+        DB_POOL_SIZE=int(os.environ.get("DB_POOL_SIZE", 10)),
+        INSERT_BATCH_ENABLED=env_flag("INSERT_BATCH_ENABLED"),
+        INSERT_BATCH_MAX_SIZE=int(os.environ.get("INSERT_BATCH_MAX_SIZE", 50)),
+        INSERT_BATCH_MAX_LATENCY_MS=float(
+            os.environ.get("INSERT_BATCH_MAX_LATENCY_MS", 5)
+        ),
+        INSERT_BATCH_TIMEOUT_MS=float(os.environ.get("INSERT_BATCH_TIMEOUT_MS", 5000)),
+        RATE_LIMIT_ENABLED=env_flag("RATE_LIMIT_ENABLED"),
+        RATE_LIMIT_CLIENT_RATE=float(os.environ.get("RATE_LIMIT_CLIENT_RATE", 20)),
+        RATE_LIMIT_CLIENT_BURST=float(os.environ.get("RATE_LIMIT_CLIENT_BURST", 40)),
+        RATE_LIMIT_ENDPOINT_RATE=float(os.environ.get("RATE_LIMIT_ENDPOINT_RATE", 200)),
+        RATE_LIMIT_ENDPOINT_BURST=float(
+            os.environ.get("RATE_LIMIT_ENDPOINT_BURST", 400)
+        ),
+        LOAD_SHED_ENABLED=env_flag("LOAD_SHED_ENABLED"),
+        LOAD_SHED_TARGET_LATENCY_MS=float(
+            os.environ.get("LOAD_SHED_TARGET_LATENCY_MS", 100)
+        ),
+        LOAD_SHED_MIN_CONCURRENCY=int(os.environ.get("LOAD_SHED_MIN_CONCURRENCY", 4)),
+        LOAD_SHED_MAX_CONCURRENCY=int(os.environ.get("LOAD_SHED_MAX_CONCURRENCY", 64)),
+        LIST_FRAGMENT_CACHE_SIZE=int(os.environ.get("LIST_FRAGMENT_CACHE_SIZE", 10000)),
+        CIRCUIT_BREAKER_ENABLED=env_flag("CIRCUIT_BREAKER_ENABLED"),
+        CIRCUIT_BREAKER_FAILURE_RATE=float(
+            os.environ.get("CIRCUIT_BREAKER_FAILURE_RATE", 0.5)
+        ),
+        CIRCUIT_BREAKER_SLOW_CALL_MS=float(
+            os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_MS", 1000)
+        ),
+        CIRCUIT_BREAKER_SLOW_CALL_RATE=float(
+            os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_RATE", 0.8)
+        ),
+        CIRCUIT_BREAKER_MIN_CALLS=int(os.environ.get("CIRCUIT_BREAKER_MIN_CALLS", 10)),
+        CIRCUIT_BREAKER_OPEN_SECONDS=float(
+            os.environ.get("CIRCUIT_BREAKER_OPEN_SECONDS", 10)
+        ),
+        DB_ADAPTIVE_TIMEOUTS_ENABLED=env_flag("DB_ADAPTIVE_TIMEOUTS_ENABLED"),
+        DB_TIMEOUT_MULTIPLIER=float(os.environ.get("DB_TIMEOUT_MULTIPLIER", 4)),
+        DB_TIMEOUT_MIN_MS=float(os.environ.get("DB_TIMEOUT_MIN_MS", 500)),
+        DB_TIMEOUT_MAX_MS=float(os.environ.get("DB_TIMEOUT_MAX_MS", 5000)),
+        TASK_STORE_ENABLED=env_flag("TASK_STORE_ENABLED"),
+        TASK_STORE_REFRESH_SECONDS=float(
+            os.environ.get("TASK_STORE_REFRESH_SECONDS", 60)
+        ),
+    )
+
+
+bp = Blueprint("todo", __name__)
+_extensions_lock = threading.RLock()
 
-app = Flask(__name__)
+# Endpoints that are never rate limited or shed
+PRIORITY_ENDPOINTS = frozenset({"todo.health"})
 
+# Upper bound for any Retry-After header the app sends
+MAX_RETRY_AFTER_SECONDS = 3600
 
-def get_db_connection():
-    """Create and return a MySQL connection"""
+# Endpoints that never touch the database, so are served with the circuit open
+DB_FREE_ENDPOINTS = frozenset({"todo.index", "todo.metrics_endpoint"})
+
+
+def get_extension(name, factory):
+    """Return a shared per-app helper, creating it with factory on first use"""
+    extensions = current_app.extensions
+    extension = extensions.get(name)
+    if extension is None:
+        with _extensions_lock:
+            extension = extensions.get(name)
+            if extension is None:
+                extension = factory()
+                extensions[name] = extension
+    return extension
+
+
+def db_hosts():
+    """Database hosts, one per shard (just DB_HOST unless sharding is set up)"""
+    config = current_app.config
+    return config["DB_SHARD_HOSTS"] or [config["DB_HOST"]]
+
+
+def current_owner():
+    """Owner the current request (or CLI run) is scoped to"""
+    return g.get("owner_id") or current_app.config["DEFAULT_OWNER"]
+
+
+def current_shard():
+    """Shard holding the current owner's tasks"""
+    return owner_shard(current_owner(), len(db_hosts()))
+
+
+def db_config(shard=0):
+    """Connection settings shared by pooled and direct connections"""
+    config = current_app.config
+    settings = {
+        "host": db_hosts()[shard],
+        "user": config["DB_USER"],
+        "password": config["DB_PASSWORD"],
+        "database": config["DB_NAME"],
+        # Drain unread rows automatically so several cached cursors can
+        # share one connection within a request
+        "consume_results": True,
+    }
+    if config["DB_ADAPTIVE_TIMEOUTS_ENABLED"]:
+        # The pool keeps the value from when it was built (the ceiling, as no
+        # latencies are known yet) for every reconnect; only one-off
+        # connections pick up the p99-derived value
+        settings["connection_timeout"] = get_db_timeouts().connect_timeout()
+    return settings
+
+
+def get_pool(shard=0):
+    """Return the shard's shared connection pool, creating it on first use"""
+    # Session reset would deallocate the prepared statements cached on each
+    # connection, so it is disabled
+    return get_extension(
+        f"db_pool.{shard}",
+        lambda: driver.pooling.MySQLConnectionPool(
+            pool_name=f"todo-{shard}",
+            pool_size=current_app.config["DB_POOL_SIZE"],
+            pool_reset_session=False,
+            **db_config(shard),
+        ),
+    )
+
+
+def get_db_connection(shard=0):
+    """Borrow a MySQL connection from the pool (or open one if pooling is off)"""
     try:
-        return mysql.connector.connect(
-            host=os.environ["DB_HOST"],
-            user=os.environ["DB_USER"],
-            password=os.environ["DB_PASSWORD"],
-            database=os.environ["DB_NAME"],
-        )
-    except MySQLError as e:
+        if current_app.config["DB_POOL_SIZE"] < 1:
+            return statement_cache.mark_direct(driver.connect(**db_config(shard)))
+        try:
+            return get_pool(shard).get_connection()
+        except driver.errors.PoolError:
+            metrics.incr("db_pool_exhausted_total")
+            return statement_cache.mark_direct(driver.connect(**db_config(shard)))
+    except driver.Error as e:
         logging.error(f"Database connection failed: {e}")
         raise
 
 
 @contextmanager
-def get_db():
-    """Context manager for safe database connections and transactions"""
+def get_db(shard=None):
+    """Context manager for safe database connections and transactions
+
+    Connects to the current owner's shard unless a shard is given.
+    """
+    if shard is None:
+        shard = current_shard()
     conn = None
+    failed = False
+    started = time.monotonic()
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(shard)
+        if current_app.config["DB_ADAPTIVE_TIMEOUTS_ENABLED"]:
+            get_db_timeouts().apply(conn)
         yield conn
         conn.commit()
-    except MySQLError as e:
+    except driver.Error as e:
+        failed = True
         if conn:
             conn.rollback()
         logging.error(f"Database error: {e}")
         raise
+    except Exception:
+        # Never hand a connection with an open transaction back to the pool
+        if conn:
+            conn.rollback()
+        raise
     finally:
         if conn:
             conn.close()
+        observe_db_latency((time.monotonic() - started) * 1000.0, failed, shard)
+
+
+@contextmanager
+def get_streaming_db(shard=0):
+    """Dedicated unpooled connection for long unbuffered reads such as exports
+
+    Closing it drops any unread rows with the socket, so an aborted stream
+    never leaves a half-read result on a pooled connection.
+
+    Its outcome is reported to the circuit breaker with the connect time as
+    latency: an export's duration depends on its size, not database health.
+    """
+    started = time.monotonic()
+    try:
+        conn = driver.connect(**db_config(shard))
+    except driver.Error as e:
+        logging.error(f"Database connection failed: {e}")
+        record_circuit((time.monotonic() - started) * 1000.0, True, shard)
+        raise
+    connect_ms = (time.monotonic() - started) * 1000.0
+    failed = False
+    try:
+        yield conn
+    except driver.Error:
+        failed = True
+        raise
+    finally:
+        conn.close()
+        record_circuit(connect_ms, failed, shard)
+
+
+def stream_task_rows(query, params, metric="export_rows_total", shard=0):
+    """Yield chunks of rows from an unbuffered cursor on one shard"""
+    with get_streaming_db(shard) as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, params)
+        for rows in iter_chunks(cursor):
+            metrics.incr(metric, len(rows))
+            yield rows
+
+
+def load_all_tasks(flask_app):
+    """Stream every shard's todos table in id order (warms the task store)"""
+    with flask_app.app_context():
+        for shard in range(len(db_hosts())):
+            yield from stream_task_rows(
+                sql.SELECT_OWNED_TASKS,
+                (),
+                metric="task_store_rows_loaded_total",
+                shard=shard,
+            )
+
+
+def record_circuit(latency_ms, failed=False, shard=0):
+    """Report one outcome to the shard's circuit breaker (when enabled)"""
+    if current_app.config["CIRCUIT_BREAKER_ENABLED"]:
+        get_circuit_breaker(shard).record(latency_ms, failed)
+
+
+def observe_db_latency(latency_ms, failed=False, shard=0):
+    """Record how long a unit of DB work took and feed the adaptive limits"""
+    metrics.observe("db_latency_ms", latency_ms)
+    config = current_app.config
+    record_circuit(latency_ms, failed, shard)
+    if config["DB_ADAPTIVE_TIMEOUTS_ENABLED"] and not failed:
+        get_db_timeouts().observe(latency_ms)
+    if config["LOAD_SHED_ENABLED"]:
+        limiter = get_concurrency_limiter()
+        limiter.observe(latency_ms)
+        metrics.set_gauge("concurrency_limit", limiter.limit)
+
+
+@contextmanager
+def get_app_db(flask_app, shard=0):
+    """get_db() usable from background threads outside any request"""
+    with flask_app.app_context(), get_db(shard) as conn:
+        yield conn
+
+
+def get_insert_batcher(shard=0):
+    """Return the shard's shared group-commit batcher"""
+    flask_app = current_app._get_current_object()
+    return get_extension(
+        f"insert_batcher.{shard}",
+        lambda: InsertBatcher(
+            lambda: get_app_db(flask_app, shard),
+            max_batch_size=current_app.config["INSERT_BATCH_MAX_SIZE"],
+            max_latency_ms=current_app.config["INSERT_BATCH_MAX_LATENCY_MS"],
+            timeout_ms=current_app.config["INSERT_BATCH_TIMEOUT_MS"],
+        ),
+    )
+
+
+def get_rate_limiter():
+    """Return the shared per-client/per-endpoint token-bucket limiter"""
+    return get_extension(
+        "rate_limiter",
+        lambda: RateLimiter(
+            client_rate=current_app.config["RATE_LIMIT_CLIENT_RATE"],
+            client_burst=current_app.config["RATE_LIMIT_CLIENT_BURST"],
+            endpoint_rate=current_app.config["RATE_LIMIT_ENDPOINT_RATE"],
+            endpoint_burst=current_app.config["RATE_LIMIT_ENDPOINT_BURST"],
+        ),
+    )
+
+
+def get_concurrency_limiter():
+    """Return the shared latency-driven concurrency limiter"""
+    return get_extension(
+        "concurrency_limiter",
+        lambda: AdaptiveConcurrencyLimiter(
+            target_latency_ms=current_app.config["LOAD_SHED_TARGET_LATENCY_MS"],
+            min_limit=current_app.config["LOAD_SHED_MIN_CONCURRENCY"],
+            max_limit=current_app.config["LOAD_SHED_MAX_CONCURRENCY"],
+        ),
+    )
+
+
+def get_circuit_breaker(shard=0):
+    """Return the circuit breaker for one database shard"""
+    return get_extension(
+        f"circuit_breaker.{shard}",
+        lambda: CircuitBreaker(
+            failure_threshold=current_app.config["CIRCUIT_BREAKER_FAILURE_RATE"],
+            slow_call_ms=current_app.config["CIRCUIT_BREAKER_SLOW_CALL_MS"],
+            slow_call_threshold=current_app.config["CIRCUIT_BREAKER_SLOW_CALL_RATE"],
+            min_calls=current_app.config["CIRCUIT_BREAKER_MIN_CALLS"],
+            open_seconds=current_app.config["CIRCUIT_BREAKER_OPEN_SECONDS"],
+        ),
+    )
+
+
+def get_db_timeouts():
+    """Return the shared p99-derived connection and statement timeouts"""
+    return get_extension(
+        "db_timeouts",
+        lambda: AdaptiveTimeout(
+            multiplier=current_app.config["DB_TIMEOUT_MULTIPLIER"],
+            min_ms=current_app.config["DB_TIMEOUT_MIN_MS"],
+            max_ms=current_app.config["DB_TIMEOUT_MAX_MS"],
+        ),
+    )
+
+
+def get_task_store():
+    """Return the shared in-memory copy of the todos table"""
+    flask_app = current_app._get_current_object()
+    return get_extension(
+        "task_store",
+        lambda: TaskStore(
+            lambda: load_all_tasks(flask_app),
+            refresh_seconds=current_app.config["TASK_STORE_REFRESH_SECONDS"],
+        ),
+    )
+
+
+def hot_task_store():
+    """The task store if it is enabled and warmed, else None (read MySQL)"""
+    if not current_app.config["TASK_STORE_ENABLED"]:
+        return None
+    store = get_task_store()
+    if not store.ready:
+        return None
+    metrics.incr("task_store_reads_total")
+    return store
+
+
+def refresh_task_store():
+    """Ask the task store to reload after writes whose ids are not known"""
+    if current_app.config["TASK_STORE_ENABLED"]:
+        get_task_store().request_refresh()
+
+
+def get_fragment_cache():
+    """Return the shared cache of rendered /list rows"""
+    return get_extension(
+        "fragment_cache",
+        lambda: FragmentCache(maxsize=current_app.config["LIST_FRAGMENT_CACHE_SIZE"]),
+    )
+
+
+def client_id():
+    """Identify the caller (nginx passes the real address in X-Real-IP)"""
+    return request.headers.get("X-Real-IP") or request.remote_addr or "unknown"
+
+
+def shed_request(
+    reason, status_code, retry_after, message="Too many requests, retry later"
+):
+    """Reject a request without touching the database and count it"""
+    endpoint = request.endpoint or "unknown"
+    metrics.incr("requests_shed_total")
+    metrics.incr(f"requests_shed_total.{reason}.{endpoint}")
+    logging.warning(f"Request shed ({reason}): {endpoint} from {client_id()}")
+    response = jsonify({"error": message})
+    response.status_code = status_code
+    retry_after = min(retry_after, MAX_RETRY_AFTER_SECONDS)
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+@bp.before_app_request
+def resolve_owner():
+    """Scope the request to the owner named in X-Owner-Id (or the default)"""
+    owner_id = request.headers.get(OWNER_HEADER)
+    if owner_id is None:
+        g.owner_id = current_app.config["DEFAULT_OWNER"]
+        return None
+    try:
+        g.owner_id = validate_owner(owner_id.strip())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return None
+
+
+@bp.before_app_request
+def admit_request():
+    """Apply rate limits, the DB circuit and concurrency limits before routing"""
+    endpoint = request.endpoint
+    if endpoint is None or endpoint in PRIORITY_ENDPOINTS:
+        return None
+    if current_app.config["RATE_LIMIT_ENABLED"]:
+        allowed, retry_after = get_rate_limiter().acquire(client_id(), endpoint)
+        if not allowed:
+            return shed_request("rate_limited", 429, retry_after)
+    if current_app.config["CIRCUIT_BREAKER_ENABLED"] and (
+        endpoint not in DB_FREE_ENDPOINTS
+    ):
+        breaker = get_circuit_breaker(current_shard())
+        allowed, probe = breaker.acquire()
+        if not allowed:
+            return shed_request(
+                "circuit_open",
+                503,
+                breaker.retry_after(),
+                message="Database unavailable, retry later",
+            )
+        if probe is not None:
+            g.circuit_probe = (breaker, probe)
+    if current_app.config["LOAD_SHED_ENABLED"]:
+        if not get_concurrency_limiter().try_acquire():
+            return shed_request("overloaded", 503, 1)
+        g.concurrency_slot = True
+    return None
+
+
+@bp.teardown_app_request
+def release_request(error):
+    """Give back the concurrency slot and any unresolved circuit probe
+
+    A probe request that never reached the database (validation error, task
+    store read) would otherwise hold the half-open slot for open_seconds.
+    """
+    if g.pop("concurrency_slot", False):
+        get_concurrency_limiter().release()
+    circuit_probe = g.pop("circuit_probe", None)
+    if circuit_probe is not None:
+        breaker, probe = circuit_probe
+        breaker.release_probe(probe)
+
+
+def insert_task(task, priority=DEFAULT_PRIORITY, due_at=NO_DUE_DATE):
+    """Insert a pending task and return its id (group-committed when enabled)"""
+    owner_id = current_owner()
+    if current_app.config["INSERT_BATCH_ENABLED"]:
+        task_id = get_insert_batcher(current_shard()).submit(
+            task, owner_id=owner_id, priority=priority, due_at=due_at
+        )
+    else:
+        with get_db() as conn:
+            cursor = statement_cache.execute(
+                conn,
+                sql.INSERT_TASK,
+                (owner_id, task, "pending", priority, due_at),
+            )
+            task_id = cursor.lastrowid
+    if current_app.config["TASK_STORE_ENABLED"]:
+        get_task_store().put(owner_id, task_id, task, "pending")
+    return task_id
+
+
+def get_task_counts(conn, owner_id):
+    """Read an owner's per-status totals from the trigger-maintained table"""
+    cursor = statement_cache.execute(conn, sql.SELECT_TASK_COUNTS, (owner_id,))
+    counts = dict.fromkeys(TASK_STATUSES, 0)
+    for status, total in cursor.fetchall():
+        counts[status] = int(total)
+    return counts
 
 
 def validate_task(task):
@@ -68,38 +590,60 @@ def validate_task(task):
     return task
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     """Render home page with add task form"""
     logging.info("Index page accessed")
-    return """
-        <h1>Todo API</h1>
-        <form action="/add_from_browser" method="post">
-            <input type="text" name="task" placeholder="Enter a task" required>
-            <button type="submit">Add Task</button>
-        </form>
-        <br>
-        <a href="/list"><button>View All Tasks</button></a>
-    """
+    return Response(INDEX_PAGE, mimetype="text/html")
 
 
-@app.route("/health")
+@bp.route("/health")
 def health():
-    """Health check endpoint"""
+    """Health check endpoint (also probes the database while the circuit is open)
+
+    With several shards every one is probed and reported under "shards".
+    """
+    shards = [check_shard(shard) for shard in range(len(db_hosts()))]
+    if len(shards) == 1:
+        result = shards[0]
+    else:
+        statuses = {shard["status"] for shard in shards}
+        result = {"status": "healthy", "shards": shards}
+        for status in ("degraded", "unhealthy"):
+            if status in statuses:
+                result["status"] = status
+    status_code = 503 if result["status"] == "unhealthy" else 200
+    return jsonify(result), status_code
+
+
+def check_shard(shard):
+    """Probe one database shard and describe its health"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
+        with get_db(shard) as conn:
+            cursor = statement_cache.execute(conn, sql.HEALTH_CHECK)
             cursor.fetchone()
-        return jsonify({"status": "healthy"}), 200
+        result = {"status": "healthy"}
     except Exception as e:
-        logging.error(f"Health check failed: {e}")
-        return jsonify({"status": "unhealthy", "error": str(e)}), 503
+        logging.error(f"Health check of shard {shard} failed: {e}")
+        result = {"status": "unhealthy", "error": str(e)}
+    if current_app.config["CIRCUIT_BREAKER_ENABLED"]:
+        circuit = get_circuit_breaker(shard).snapshot()
+        result["circuit"] = circuit
+        # The database answers again but requests are still being failed fast
+        if result["status"] == "healthy" and circuit["state"] == OPEN:
+            result["status"] = "degraded"
+    return result
+
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    """In-process counters and histograms (JSON)"""
+    return jsonify(metrics.snapshot()), 200
 
 
-@app.route("/add", methods=["POST"])
+@bp.route("/add", methods=["POST"])
 def add():
-    """API endpoint to add a task (JSON)"""
+    """API endpoint to add a task (JSON, optional priority 0-9 and due_at)"""
     try:
         try:
             data = request.get_json()
@@ -111,13 +655,9 @@ def add():
 
         task = data.get("task")
         task = validate_task(task)
-
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO todos (task, status) VALUES (%s, %s)", (task, "pending")
-            )
-            task_id = cursor.lastrowid
+        priority = parse_priority(data.get("priority"))
+        due_at = parse_due_at(data.get("due_at"))
+        task_id = insert_task(task, priority, due_at)
 
         logging.info(f"Task added: {task_id}")
         return (
@@ -127,6 +667,8 @@ def add():
                     "task_id": task_id,
                     "task": task,
                     "status": "pending",
+                    "priority": priority,
+                    "due_at": format_due_at(due_at),
                 }
             ),
             201,
@@ -135,7 +677,12 @@ def add():
     except ValueError as e:
         logging.warning(f"Validation error: {e}")
         return jsonify({"error": str(e)}), 400
-    except MySQLError as e:
+    except TimeoutError:
+        # The batcher withdrew the row, so a retry cannot duplicate it
+        return shed_request(
+            "insert_timeout", 503, 1, "Task was not saved in time, retry later"
+        )
+    except driver.Error as e:
         logging.error(f"Database error in /add: {e}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
@@ -143,26 +690,21 @@ def add():
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route("/add_from_browser", methods=["POST"])
+@bp.route("/add_from_browser", methods=["POST"])
 def add_from_browser():
     """Browser form endpoint to add a task"""
     try:
         task = request.form.get("task")
         task = validate_task(task)
-
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO todos (task, status) VALUES (%s, %s)", (task, "pending")
-            )
+        insert_task(task)
 
         logging.info(f"Task added from browser: {task}")
-        return f'<h2>Added "{task}"!</h2> <a href="/">Go back</a>'
+        return render_message(f'Added "{task}"!')
 
     except ValueError as e:
         logging.warning(f"Validation error: {e}")
-        return f'<h2>Error: {str(e)}</h2> <a href="/">Go back</a>', 400
-    except MySQLError as e:
+        return render_message(f"Error: {e}"), 400
+    except driver.Error as e:
         logging.error(f"Database error in /add_from_browser: {e}")
         return '<h2>Database error occurred</h2> <a href="/">Go back</a>', 500
     except Exception as e:
@@ -170,33 +712,25 @@ def add_from_browser():
         return '<h2>An error occurred</h2> <a href="/">Go back</a>', 500
 
 
-@app.route("/list")
+@bp.route("/list")
 def list_all():
     """Get all tasks (HTML view)"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, task, status FROM todos")
-            tasks = cursor.fetchall()
+        owner_id = current_owner()
+        store = hot_task_store()
+        if store is not None:
+            tasks = store.rows(owner_id)
+        else:
+            with get_db() as conn:
+                cursor = statement_cache.execute(
+                    conn, sql.SELECT_ALL_TASKS, (owner_id,)
+                )
+                tasks = cursor.fetchall()
+
+        page = get_fragment_cache().render_list(tasks)
+        return Response(page, mimetype="text/html")
 
-        html = """
-            <h1>Todo List</h1>
-            <table border="1" cellpadding="10">
-                <tr><th>ID</th><th>Task</th><th>Status</th><th>Actions</th></tr>
-        """
-        for task_id, task_text, status in tasks:
-            action_buttons = f'<a href="/delete/{task_id}">Delete</a>'
-            if status == "pending":
-                action_buttons += f' | <a href="/complete/{task_id}">Mark Complete</a>'
-            html += f"<tr><td>{task_id}</td><td>{task_text}</td><td>{status}</td><td>{action_buttons}</td></tr>"
-
-        html += """
-            </table>
-            <br><a href="/"><button>Back</button></a>
-        """
-        return html
-
-    except MySQLError as e:
+    except driver.Error as e:
         logging.error(f"Database error in /list: {e}")
         return "<h2>Database error occurred</h2>", 500
     except Exception as e:
@@ -204,81 +738,270 @@ def list_all():
         return "<h2>An error occurred</h2>", 500
 
 
-@app.route("/tasks", methods=["GET"])
+def read_task_page(owner_id, status_filter, per_page, offset, include_total):
+    """Read one page of an owner's tasks (and optionally its counters) from MySQL"""
+    counts = None
+    with get_db() as conn:
+        if status_filter:
+            cursor = statement_cache.execute(
+                conn,
+                sql.SELECT_STATUS_PAGE,
+                (owner_id, status_filter, per_page, offset),
+                dictionary=True,
+            )
+        else:
+            cursor = statement_cache.execute(
+                conn,
+                sql.SELECT_TASK_PAGE,
+                (owner_id, per_page, offset),
+                dictionary=True,
+            )
+        tasks = cursor.fetchall()
+
+        if include_total:
+            counts = get_task_counts(conn, owner_id)
+    return tasks, counts
+
+
+@bp.route("/tasks", methods=["GET"])
 def get_tasks_api():
     """API endpoint to get all tasks (JSON) - Returns all tasks with pagination support"""
     try:
         page = request.args.get("page", 1, type=int)
         per_page = request.args.get("per_page", 10, type=int)
         status_filter = request.args.get("status", type=str)
+        include_total = parse_flag(request.args.get("total", ""))
 
         if page < 1 or per_page < 1 or per_page > 100:
             return jsonify({"error": "Invalid pagination parameters"}), 400
 
         offset = (page - 1) * per_page
 
-        with get_db() as conn:
-            cursor = conn.cursor(dictionary=True)
+        owner_id = current_owner()
+        store = hot_task_store()
+        if store is not None:
+            tasks = store.page(owner_id, status_filter or None, per_page, offset)
+            if include_total:
+                counts = store.counts(owner_id)
+        else:
+            tasks, counts = read_task_page(
+                owner_id, status_filter, per_page, offset, include_total
+            )
 
-            # Build query based on filters
-            query = "SELECT id, task, status FROM todos"
-            params = []
+        logging.info(f"Retrieved {len(tasks)} tasks from page {page}")
+        result = {
+            "page": page,
+            "per_page": per_page,
+            "count": len(tasks),
+            "tasks": tasks,
+        }
+        if include_total:
             if status_filter:
-                query += " WHERE status = %s"
-                params.append(status_filter)
+                result["total"] = counts.get(status_filter, 0)
+            else:
+                result["total"] = sum(counts.values())
+        return jsonify(result), 200
+
+    except driver.Error as e:
+        logging.error(f"Database error in /tasks: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error in /tasks: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@bp.route("/tasks/stats", methods=["GET"])
+def get_task_stats():
+    """API endpoint for task counts per status (served from summary counters)"""
+    try:
+        with get_db() as conn:
+            counts = get_task_counts(conn, current_owner())
+
+        return jsonify({"counts": counts, "total": sum(counts.values())}), 200
+
+    except driver.Error as e:
+        logging.error(f"Database error in /tasks/stats: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error in /tasks/stats: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 
-            query += " LIMIT %s OFFSET %s"
-            params.extend([per_page, offset])
+@bp.route("/tasks/next", methods=["GET"])
+def get_next_tasks():
+    """API endpoint for the n most urgent pending tasks (priority, then due date)"""
+    try:
+        n = request.args.get("n", 10, type=int)
+        if n < 1 or n > 100:
+            return jsonify({"error": "n must be between 1 and 100"}), 400
 
-            cursor.execute(query, params)
+        with get_db() as conn:
+            cursor = statement_cache.execute(
+                conn, sql.SELECT_NEXT_TASKS, (current_owner(), n), dictionary=True
+            )
             tasks = cursor.fetchall()
 
-        logging.info(f"Retrieved {len(tasks)} tasks from page {page}")
-        return (
-            jsonify(
-                {
-                    "page": page,
-                    "per_page": per_page,
-                    "count": len(tasks),
-                    "tasks": tasks,
-                }
-            ),
-            200,
+        for task in tasks:
+            task["due_at"] = format_due_at(task["due_at"])
+        return jsonify({"count": len(tasks), "tasks": tasks}), 200
+
+    except driver.Error as e:
+        logging.error(f"Database error in /tasks/next: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error in /tasks/next: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@bp.route("/tasks/export", methods=["GET"])
+def export_tasks():
+    """Stream tasks as NDJSON, CSV or Arrow (optional status and since_id)"""
+    try:
+        export_format = request.args.get("format", "ndjson")
+        status_filter = request.args.get("status", type=str)
+        since_id = request.args.get("since_id", 0, type=int)
+
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported export format"}), 400
+        if status_filter and status_filter not in TASK_STATUSES:
+            return jsonify({"error": "Invalid status filter"}), 400
+        if since_id < 0:
+            return jsonify({"error": "Invalid since_id"}), 400
+
+        try:
+            encoder = EXPORT_FORMATS[export_format]()
+        except ImportError:
+            return jsonify({"error": "Arrow export requires pyarrow"}), 501
+
+        query, params = export_query(current_owner(), status_filter, since_id)
+        chunks = stream_task_rows(query, params, shard=current_shard())
+        # Pull the first chunk now so connection and query errors become a
+        # proper error response instead of a truncated stream
+        first = next(chunks, None)
+        if first is not None:
+            chunks = chain([first], chunks)
+
+        logging.info(f"Export started: format={export_format} since_id={since_id}")
+        response = Response(
+            stream_with_context(encode_stream(encoder, chunks)),
+            mimetype=encoder.mimetype,
         )
+        # Let nginx pass chunks straight through instead of buffering them
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
 
-    except MySQLError as e:
-        logging.error(f"Database error in /tasks: {e}")
+    except driver.Error as e:
+        logging.error(f"Database error in /tasks/export: {e}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
-        logging.error(f"Unexpected error in /tasks: {e}")
+        logging.error(f"Unexpected error in /tasks/export: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route("/complete/<int:task_id>", methods=["POST", "GET"])
+@bp.route("/tasks/import", methods=["POST"])
+def import_tasks():
+    """Bulk import tasks from a streamed NDJSON or CSV request body
+
+    A failed import reports ``bytes_committed``; re-sending the same body with
+    ``?offset=<bytes_committed>`` skips what was already loaded.
+    """
+    importer = None
+    try:
+        import_format = request.args.get("format", "ndjson")
+        batch_size = request.args.get("batch_size", DEFAULT_BATCH_SIZE, type=int)
+        offset = request.args.get("offset", 0, type=int)
+
+        if import_format not in IMPORT_FORMATS:
+            return jsonify({"error": "Unsupported import format"}), 400
+        if batch_size < 1 or batch_size > 10000:
+            return jsonify({"error": "batch_size must be between 1 and 10000"}), 400
+        if offset < 0:
+            return jsonify({"error": "offset must not be negative"}), 400
+
+        importer = BulkImporter(
+            lambda: get_db(),
+            validate_task,
+            batch_size=batch_size,
+            progress=lambda state: logging.info(
+                f"Import progress: {state['imported']} imported, "
+                f"{state['rejected']} rejected, {state['offset']} bytes"
+            ),
+            owner_id=current_owner(),
+        )
+        importer.state["offset"] = offset
+        state = importer.run(records_for(request.stream, import_format, offset))
+        refresh_task_store()
+
+        logging.info(f"Import finished: {state['imported']} tasks")
+        return jsonify(import_summary(importer)), 200
+
+    except ValueError as e:
+        logging.warning(f"Import rejected: {e}")
+        return import_failed(importer, str(e), 400)
+    except driver.Error as e:
+        logging.error(f"Database error in /tasks/import: {e}")
+        return import_failed(importer, "Database error", 500)
+    except Exception as e:
+        logging.error(f"Unexpected error in /tasks/import: {e}")
+        return import_failed(importer, "Internal server error", 500)
+
+
+def import_failed(importer, message, status_code):
+    """Error response that still says how far the import got
+
+    Batches committed before the error stay committed, so the client needs
+    bytes_committed to resume without duplicating them.
+    """
+    result = {"error": message}
+    if importer is not None:
+        result.update(import_summary(importer))
+        refresh_task_store()
+    return jsonify(result), status_code
+
+
+def import_summary(importer):
+    """Describe import progress; bytes_committed is where a retry resumes"""
+    return {
+        "imported": importer.state["imported"],
+        "rejected": importer.state["rejected"],
+        "bytes_committed": importer.state["offset"],
+        "errors": [
+            {"record": number, "error": message}
+            for number, message in importer.errors[:20]
+        ],
+    }
+
+
+@bp.route("/complete/<int:task_id>", methods=["POST", "GET"])
 def complete_task(task_id):
     """Mark a task as completed"""
     try:
         if task_id < 1:
             return jsonify({"error": "Invalid task ID"}), 400
 
+        owner_id = current_owner()
         with get_db() as conn:
-            cursor = conn.cursor()
             # Check if task exists
-            cursor.execute("SELECT id FROM todos WHERE id = %s", (task_id,))
+            cursor = statement_cache.execute(
+                conn, sql.SELECT_TASK_ID, (owner_id, task_id)
+            )
             if not cursor.fetchone():
                 return jsonify({"error": "Task not found"}), 404
 
             # Update task status
-            cursor.execute(
-                "UPDATE todos SET status = %s WHERE id = %s", ("completed", task_id)
+            statement_cache.execute(
+                conn, sql.UPDATE_TASK_STATUS, ("completed", owner_id, task_id)
             )
 
+        if current_app.config["TASK_STORE_ENABLED"]:
+            get_task_store().set_status(owner_id, task_id, "completed")
+
         logging.info(f"Task marked complete: {task_id}")
         if request.method == "GET":
             return '<h2>Task marked complete!</h2> <a href="/list">Back to list</a>'
         return jsonify({"message": "Task marked complete", "task_id": task_id}), 200
 
-    except MySQLError as e:
+    except driver.Error as e:
         logging.error(f"Database error in /complete: {e}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
@@ -286,29 +1009,34 @@ def complete_task(task_id):
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route("/delete/<int:task_id>", methods=["POST", "GET"])
+@bp.route("/delete/<int:task_id>", methods=["POST", "GET"])
 def delete(task_id):
     """Delete a task by ID"""
     try:
         if task_id < 1:
             return jsonify({"error": "Invalid task ID"}), 400
 
+        owner_id = current_owner()
         with get_db() as conn:
-            cursor = conn.cursor()
             # Check if task exists
-            cursor.execute("SELECT id FROM todos WHERE id = %s", (task_id,))
+            cursor = statement_cache.execute(
+                conn, sql.SELECT_TASK_ID, (owner_id, task_id)
+            )
             if not cursor.fetchone():
                 return jsonify({"error": "Task not found"}), 404
 
             # Delete task
-            cursor.execute("DELETE FROM todos WHERE id = %s", (task_id,))
+            statement_cache.execute(conn, sql.DELETE_TASK, (owner_id, task_id))
+
+        if current_app.config["TASK_STORE_ENABLED"]:
+            get_task_store().remove(owner_id, task_id)
 
         logging.info(f"Task deleted: {task_id}")
         if request.method == "GET":
             return '<h2>Task deleted!</h2> <a href="/list">Back to list</a>'
         return jsonify({"message": "Task deleted", "task_id": task_id}), 200
 
-    except MySQLError as e:
+    except driver.Error as e:
         logging.error(f"Database error in /delete: {e}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
@@ -316,18 +1044,41 @@ def delete(task_id):
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
     return jsonify({"error": "Endpoint not found"}), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
     logging.error(f"Internal server error: {error}")
     return jsonify({"error": "Internal server error"}), 500
 
 
+def create_app(config=None):
+    """Application factory: build an app from the environment plus overrides
+
+    Nothing here touches the filesystem or imports the MySQL driver; the log
+    file and the first connection are created on first use (the task store,
+    when enabled, connects from its own thread).
+    """
+    flask_app = Flask(__name__)
+    flask_app.config.update(load_config())
+    if config:
+        flask_app.config.update(config)
+    configure_logging(flask_app.config["LOG_DIR"])
+    flask_app.register_blueprint(bp)
+    if flask_app.config["TASK_STORE_ENABLED"]:
+        # Warms in the background; reads use MySQL until it is ready
+        with flask_app.app_context():
+            get_task_store().start()
+    return flask_app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
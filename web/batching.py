@@ -0,0 +1,185 @@
+"""Write-behind group commit for task inserts
+
+Concurrent requests hand their rows to a single writer thread which gathers
+them for at most ``max_latency_ms`` (or until ``max_batch_size`` rows are
+queued) and writes the whole group with one multi-row INSERT and one commit.
+Each caller blocks until its batch is committed and gets its own task id back.
+A caller that gives up before its row is picked for a batch withdraws it, so
+a timeout always means the row was not written.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from fields import DEFAULT_PRIORITY, NO_DUE_DATE
+from metrics import metrics
+from tenancy import DEFAULT_OWNER
+
+
+class _PendingInsert:
+    """A row waiting for its batch to be committed"""
+
+    __slots__ = (
+        "owner_id",
+        "task",
+        "status",
+        "priority",
+        "due_at",
+        "done",
+        "task_id",
+        "error",
+        "claimed",
+        "abandoned",
+    )
+
+    def __init__(
+        self,
+        task,
+        status,
+        owner_id=DEFAULT_OWNER,
+        priority=DEFAULT_PRIORITY,
+        due_at=NO_DUE_DATE,
+    ):
+        self.owner_id = owner_id
+        self.task = task
+        self.status = status
+        self.priority = priority
+        self.due_at = due_at
+        self.done = threading.Event()
+        self.task_id = None
+        self.error = None
+        self.claimed = False
+        self.abandoned = False
+
+
+class InsertBatcher:
+    """Gather inserts from concurrent requests into multi-row transactions
+
+    ``get_db`` must be a callable returning the app's transactional context
+    manager. Ids are derived from the first auto-increment value of the
+    multi-row INSERT, which InnoDB allocates consecutively for simple inserts
+    (assuming the default ``auto_increment_increment`` of 1).
+    """
+
+    def __init__(
+        self, get_db, max_batch_size=50, max_latency_ms=5.0, timeout_ms=5000.0
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._get_db = get_db
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.timeout = timeout_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Guards claimed/abandoned on every pending row
+        self._claim_lock = threading.Lock()
+        self._thread = None
+
+    def submit(
+        self,
+        task,
+        status="pending",
+        timeout=None,
+        owner_id=DEFAULT_OWNER,
+        priority=DEFAULT_PRIORITY,
+        due_at=NO_DUE_DATE,
+    ):
+        """Queue a row and block until it is committed; return its id
+
+        If no batch has picked the row up within ``timeout`` seconds (default
+        ``timeout_ms``) it is withdrawn and TimeoutError is raised; the row is
+        never written, so the caller may retry. A row already being flushed is
+        waited for, bounded by the database's own timeouts.
+        """
+        self._ensure_started()
+        pending = _PendingInsert(task, status, owner_id, priority, due_at)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout if timeout is None else timeout):
+            with self._claim_lock:
+                pending.abandoned = not pending.claimed
+            if pending.abandoned:
+                metrics.incr("insert_batch_timeouts_total")
+                raise TimeoutError("Timed out waiting for batched insert")
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.task_id
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="insert-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first row, then gather more until size or deadline"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self.flush(self._collect())
+
+    def flush(self, batch):
+        """Write a batch in one INSERT and one commit, then wake its callers"""
+        with self._claim_lock:
+            batch = [pending for pending in batch if not pending.abandoned]
+            for pending in batch:
+                pending.claimed = True
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+            params = []
+            for pending in batch:
+                params.extend(
+                    (
+                        pending.owner_id,
+                        pending.task,
+                        pending.status,
+                        pending.priority,
+                        pending.due_at,
+                    )
+                )
+            with self._get_db() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO todos (owner_id, task, status, priority, due_at)"
+                    f" VALUES {placeholders}",
+                    params,
+                )
+                first_id = cursor.lastrowid
+            for offset, pending in enumerate(batch):
+                pending.task_id = first_id + offset
+        except Exception as e:
+            logging.error(f"Batched insert of {len(batch)} rows failed: {e}")
+            metrics.incr("insert_batch_errors_total")
+            for pending in batch:
+                pending.error = e
+        else:
+            metrics.incr("insert_batches_total")
+            metrics.incr("insert_batch_rows_total", len(batch))
+            metrics.observe("insert_batch_size", len(batch))
+            metrics.observe(
+                "insert_batch_flush_ms", (time.monotonic() - started) * 1000.0
+            )
+        finally:
+            for pending in batch:
+                pending.done.set()
@@ -0,0 +1,316 @@
+"""Bulk task import from NDJSON or CSV, as a library and a CLI
+
+Input is parsed one line at a time and handled in fixed-size batches: each
+batch is validated with ``validate_task``, written with one multi-row INSERT
+and committed, so memory stays bounded however large the file is. After
+every commit the byte offset reached is written to an optional checkpoint
+file. An interrupted import resumes from there, re-sending at most the one
+batch whose checkpoint was not yet saved.
+
+    python bulk_import.py tasks.ndjson
+    python bulk_import.py tasks.csv --batch-size 5000 --checkpoint tasks.ckpt
+    python bulk_import.py team-a.ndjson --owner team-a
+
+CSV files need a header row with a ``task`` column and optionally
+``status``, ``priority`` (0-9) and ``due_at`` (ISO 8601) columns. NDJSON
+lines are objects with the same keys.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+import statements as sql
+from fields import parse_due_at, parse_priority
+from metrics import metrics
+from statements import TASK_STATUSES
+from tenancy import DEFAULT_OWNER, validate_owner
+
+IMPORT_FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRecordError(ValueError):
+    """A line that could not be parsed into a task record"""
+
+
+def iter_ndjson_records(stream, offset=0):
+    """Yield (record, offset_after_record) for each non-blank NDJSON line"""
+    for line in stream:
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = ImportRecordError(f"Invalid JSON: {e}")
+        if not isinstance(record, (dict, ImportRecordError)):
+            record = ImportRecordError("Each line must be a JSON object")
+        yield record, offset
+
+
+def read_csv_header(stream):
+    """Read the header row and return (column names, bytes consumed)"""
+    line = stream.readline()
+    header = next(csv.reader([line.decode("utf-8-sig")]), [])
+    return [column.strip() for column in header], len(line)
+
+
+def iter_csv_records(stream, header, offset=0):
+    """Yield (record, offset_after_record) for each CSV row after the header
+
+    csv.reader only pulls the lines it needs for the current record, so the
+    running byte count is exact even for quoted fields spanning lines.
+    """
+    position = offset
+
+    def lines():
+        nonlocal position
+        for line in stream:
+            position += len(line)
+            yield line.decode("utf-8")
+
+    for row in csv.reader(lines()):
+        if not row:
+            continue
+        if len(row) > len(header):
+            yield ImportRecordError("Too many columns"), position
+        else:
+            yield dict(zip(header, row)), position
+
+
+def validate_batch(records, validate):
+    """Validate a batch of records; return (rows, errors)
+
+    rows are ``(task, status, priority, due_at)`` tuples ready for insertion
+    and errors are ``(record_number, message)`` pairs for everything rejected.
+    """
+    rows = []
+    errors = []
+    for number, record in records:
+        try:
+            if isinstance(record, ImportRecordError):
+                raise record
+            task = validate(record.get("task"))
+            status = record.get("status") or "pending"
+            if status not in TASK_STATUSES:
+                raise ValueError(f"Invalid status: {status}")
+            priority = parse_priority(record.get("priority"))
+            due_at = parse_due_at(record.get("due_at"))
+            rows.append((task, status, priority, due_at))
+        except ValueError as e:
+            errors.append((number, str(e)))
+    return rows, errors
+
+
+class Checkpoint:
+    """Progress saved atomically to a JSON file after every committed batch"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, state):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BulkImporter:
+    """Load task records in validated, committed batches"""
+
+    def __init__(
+        self,
+        get_db,
+        validate,
+        batch_size=DEFAULT_BATCH_SIZE,
+        checkpoint=None,
+        progress=None,
+        owner_id=DEFAULT_OWNER,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.owner_id = owner_id
+        self._get_db = get_db
+        self._validate = validate
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.state = {"offset": 0, "records": 0, "imported": 0, "rejected": 0}
+        self.errors = []
+
+    def resume_state(self):
+        """Load the saved checkpoint (if any) and return the offset to seek to"""
+        if self.checkpoint is not None:
+            self.state.update(self.checkpoint.load())
+        return self.state["offset"]
+
+    def run(self, records):
+        """Import (record, offset) pairs and return the final state"""
+        batch = []
+        offset = self.state["offset"]
+        for record, offset in records:
+            self.state["records"] += 1
+            batch.append((self.state["records"], record))
+            if len(batch) >= self.batch_size:
+                self._load(batch, offset)
+                batch = []
+        if batch:
+            self._load(batch, offset)
+        return self.state
+
+    def _load(self, batch, offset):
+        rows, errors = validate_batch(batch, self._validate)
+        if rows:
+            owner_id = self.owner_id
+            with self._get_db() as conn:
+                cursor = conn.cursor()
+                # The driver rewrites this into a single multi-row INSERT
+                cursor.executemany(
+                    sql.INSERT_TASK,
+                    [(owner_id, *row) for row in rows],
+                )
+        self.state["offset"] = offset
+        self.state["imported"] += len(rows)
+        self.state["rejected"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+        metrics.incr("import_rows_total", len(rows))
+        metrics.incr("import_rows_rejected_total", len(errors))
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.state)
+        if self.progress is not None:
+            self.progress(self.state)
+
+
+def skip_to(stream, position, offset):
+    """Move a stream at byte position forward to offset
+
+    Files are seeked; request bodies cannot be, so the skipped bytes are read
+    and discarded without being parsed.
+    """
+    if offset <= position:
+        return
+    if getattr(stream, "seekable", lambda: False)():
+        stream.seek(offset)
+        return
+    remaining = offset - position
+    while remaining > 0:
+        data = stream.read(min(remaining, 64 * 1024))
+        if not data:
+            break
+        remaining -= len(data)
+
+
+def records_for(stream, import_format, offset=0):
+    """Open a record iterator over a binary stream, resuming at offset
+
+    The stream always starts at the beginning of the input, so a CSV header
+    is read before skipping to offset.
+    """
+    if import_format == "ndjson":
+        skip_to(stream, 0, offset)
+        return iter_ndjson_records(stream, offset)
+    if import_format == "csv":
+        header, header_size = read_csv_header(stream)
+        if "task" not in header:
+            raise ValueError("CSV header must include a 'task' column")
+        skip_to(stream, header_size, offset)
+        return iter_csv_records(stream, header, max(offset, header_size))
+    raise ValueError(f"Unsupported import format: {import_format}")
+
+
+def main(argv=None):
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description="Bulk import tasks into todos")
+    parser.add_argument("path", help="NDJSON or CSV file to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--checkpoint", help="checkpoint file (default: <path>.checkpoint)"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore any saved checkpoint"
+    )
+    parser.add_argument(
+        "--owner",
+        type=validate_owner,
+        help="owner to import the tasks for (default: the DEFAULT_OWNER setting)",
+    )
+    args = parser.parse_args(argv)
+
+    from flask import g
+
+    # Importing app already builds the module-level app; reuse it rather than
+    # creating a second one (and a second task store warm-up)
+    from app import app as flask_app, get_db, validate_task
+
+    owner_id = args.owner or flask_app.config["DEFAULT_OWNER"]
+
+    import_format = args.format or (
+        "csv" if args.path.lower().endswith(".csv") else "ndjson"
+    )
+    checkpoint = Checkpoint(args.checkpoint or f"{args.path}.checkpoint")
+    if args.restart:
+        checkpoint.clear()
+
+    total_size = os.path.getsize(args.path)
+    started = time.monotonic()
+
+    def report(state):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        percent = state["offset"] / total_size * 100 if total_size else 100.0
+        print(
+            f"{percent:5.1f}%  imported {state['imported']}  "
+            f"rejected {state['rejected']}  ({state['records'] / elapsed:,.0f} rec/s)",
+            file=sys.stderr,
+        )
+
+    importer = BulkImporter(
+        get_db,
+        validate_task,
+        batch_size=args.batch_size,
+        checkpoint=checkpoint,
+        progress=report,
+        owner_id=owner_id,
+    )
+    offset = importer.resume_state()
+    if offset:
+        print(f"Resuming from byte {offset}", file=sys.stderr)
+
+    with flask_app.app_context(), open(args.path, "rb") as stream:
+        # get_db() picks the owner's shard from g
+        g.owner_id = owner_id
+        state = importer.run(records_for(stream, import_format, offset))
+
+    for number, message in importer.errors:
+        print(f"record {number}: {message}", file=sys.stderr)
+    logging.info(
+        f"Bulk import of {args.path} finished: "
+        f"{state['imported']} imported, {state['rejected']} rejected"
+    )
+    checkpoint.clear()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
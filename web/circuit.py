@@ -0,0 +1,242 @@
+"""Circuit breaker and latency-derived timeouts for database access
+
+The breaker watches the outcome of the last ``window`` units of DB work. Once
+it has seen at least ``min_calls`` and either the share of failed calls or the
+share of calls slower than ``slow_call_ms`` reaches its threshold, it opens:
+requests are failed fast with a 503 instead of piling up on a database that
+is not answering. After ``open_seconds`` it lets one probe through
+(half-open); a fast success closes it again, anything else re-opens it.
+
+Statement timeouts follow the p99 of recent successful DB work times a
+headroom multiplier, clamped to a floor and a ceiling, so a query stuck far
+beyond what the database normally takes is cut off instead of holding a
+worker.
+"""
+
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import deque
+
+import statements as sql
+from metrics import LatencyWindow, metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric encoding of the state for the circuit_state gauge
+STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by error rate and slow-call rate"""
+
+    def __init__(
+        self,
+        failure_threshold=0.5,
+        slow_call_ms=1000.0,
+        slow_call_threshold=0.8,
+        window=50,
+        min_calls=10,
+        open_seconds=10.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_threshold = slow_call_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._slow_calls = 0
+        self._probe_started = None
+
+    def _current_state(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+            self._probe_started = None
+        return self.state
+
+    def _transition(self, state):
+        self.state = state
+        metrics.set_gauge("circuit_state", STATE_GAUGE[state])
+        metrics.incr(f"circuit_transitions_total.{state}")
+
+    def _trip(self, now):
+        self.opened_at = now
+        self._transition(OPEN)
+        logging.warning(
+            f"Database circuit opened for {self.open_seconds:g}s "
+            f"(failure rate {self._rate(self._failures):.0%}, "
+            f"slow call rate {self._rate(self._slow_calls):.0%})"
+        )
+
+    def _reset(self):
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow_calls = 0
+        self._probe_started = None
+        self._transition(CLOSED)
+        logging.info("Database circuit closed")
+
+    def _rate(self, count):
+        return count / len(self._outcomes) if self._outcomes else 0.0
+
+    def allow(self, now=None):
+        """Return True if a call may go to the database now
+
+        While half-open only one probe is admitted at a time; a probe that
+        never reports back is replaced after ``open_seconds``.
+        """
+        return self.acquire(now)[0]
+
+    def acquire(self, now=None):
+        """Like allow(), but return (allowed, probe)
+
+        probe is set when the call was admitted as the half-open probe; pass
+        it to release_probe() if the call ends without touching the database.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True, None
+            if state == OPEN:
+                return False, None
+            if (
+                self._probe_started is None
+                or now - self._probe_started >= self.open_seconds
+            ):
+                self._probe_started = now
+                return True, now
+            return False, None
+
+    def release_probe(self, probe):
+        """Free the half-open slot taken by a probe that recorded no outcome
+
+        A no-op once the probe's outcome was recorded (the breaker has left
+        half-open) or the slot was handed to a newer probe.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probe_started == probe:
+                self._probe_started = None
+
+    def record(self, latency_ms, failed=False, now=None):
+        """Report the outcome of one unit of DB work"""
+        now = time.monotonic() if now is None else now
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            state = self._current_state(now)
+            if state == OPEN:
+                return
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._trip(now)
+                else:
+                    self._reset()
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                old_failed, old_slow = self._outcomes[0]
+                self._failures -= old_failed
+                self._slow_calls -= old_slow
+            self._outcomes.append((failed, slow))
+            self._failures += failed
+            self._slow_calls += slow
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            if (
+                self._failures >= self.failure_threshold * calls
+                or self._slow_calls >= self.slow_call_threshold * calls
+            ):
+                self._trip(now)
+
+    def retry_after(self, now=None):
+        """Seconds until the breaker will next admit a probe"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state != OPEN:
+                return 1.0
+            return max(0.0, self.opened_at + self.open_seconds - now)
+
+    def snapshot(self, now=None):
+        """Current state and windowed rates, as reported by /health"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "calls": len(self._outcomes),
+                "failure_rate": round(self._rate(self._failures), 3),
+                "slow_call_rate": round(self._rate(self._slow_calls), 3),
+            }
+
+
+class AdaptiveTimeout:
+    """Per-query timeouts derived from the p99 of recent DB latency
+
+    Until ``min_samples`` latencies have been seen the ceiling is used. The
+    timeout is rounded up to ``step_ms`` so it changes rarely, and is only
+    re-sent to a connection when its value for that connection changes.
+    """
+
+    def __init__(
+        self,
+        multiplier=4.0,
+        min_ms=500.0,
+        max_ms=5000.0,
+        window=200,
+        min_samples=20,
+        step_ms=100,
+    ):
+        self.multiplier = multiplier
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.min_samples = min_samples
+        self.step_ms = step_ms
+        self._latencies = LatencyWindow(window)
+        self._lock = threading.Lock()
+        self._applied = weakref.WeakKeyDictionary()
+
+    def observe(self, latency_ms):
+        self._latencies.observe(latency_ms)
+
+    def timeout_ms(self):
+        """Current statement timeout in whole milliseconds"""
+        timeout = self.max_ms
+        if len(self._latencies) >= self.min_samples:
+            p99 = self._latencies.percentile(0.99)
+            timeout = min(self.max_ms, max(self.min_ms, p99 * self.multiplier))
+        return int(math.ceil(timeout / self.step_ms) * self.step_ms)
+
+    def connect_timeout(self):
+        """Connection timeout in whole seconds, as the driver expects"""
+        return max(1, math.ceil(self.timeout_ms() / 1000.0))
+
+    def apply(self, conn):
+        """Set this connection's session timeouts if they are out of date
+
+        max_execution_time bounds SELECTs and innodb_lock_wait_timeout (whole
+        seconds) bounds writes waiting on row locks.
+        """
+        timeout_ms = self.timeout_ms()
+        cnx = getattr(conn, "_cnx", None) or conn
+        connection_id = getattr(cnx, "connection_id", None)
+        with self._lock:
+            if self._applied.get(cnx) == (connection_id, timeout_ms):
+                return timeout_ms
+        cursor = conn.cursor()
+        cursor.execute(
+            sql.SET_SESSION_TIMEOUTS,
+            (timeout_ms, max(1, math.ceil(timeout_ms / 1000.0))),
+        )
+        cursor.close()
+        with self._lock:
+            self._applied[cnx] = (connection_id, timeout_ms)
+        metrics.set_gauge("db_statement_timeout_ms", timeout_ms)
+        return timeout_ms
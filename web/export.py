@@ -0,0 +1,156 @@
+"""Streaming task export encoders (NDJSON, CSV and Arrow IPC)
+
+Rows arrive in chunks from an unbuffered cursor and each chunk is encoded to
+bytes on its own, so memory stays flat no matter how many rows are exported.
+Arrow support needs the optional ``pyarrow`` package.
+"""
+
+import csv
+import io
+from json.encoder import encode_basestring_ascii
+
+EXPORT_COLUMNS = ("id", "task", "status")
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class NDJSONEncoder:
+    """One JSON object per line"""
+
+    mimetype = "application/x-ndjson"
+
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        quote = encode_basestring_ascii
+        return "".join(
+            [
+                '{"id":%d,"task":%s,"status":%s}\n'
+                % (task_id, quote(task), quote(status))
+                for task_id, task, status in rows
+            ]
+        ).encode("ascii")
+
+    def footer(self):
+        return b""
+
+
+class CSVEncoder:
+    """RFC 4180 CSV with a header row"""
+
+    mimetype = "text/csv"
+
+    def header(self):
+        return ",".join(EXPORT_COLUMNS).encode("utf-8") + b"\r\n"
+
+    def encode(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def footer(self):
+        return b""
+
+
+class _ChunkSink:
+    """Minimal writable file object that hands back what was written"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class ArrowEncoder:
+    """Arrow IPC stream: one record batch per chunk"""
+
+    mimetype = "application/vnd.apache.arrow.stream"
+
+    def __init__(self):
+        import pyarrow
+
+        self._pa = pyarrow
+        self._schema = pyarrow.schema(
+            [
+                ("id", pyarrow.int32()),
+                ("task", pyarrow.string()),
+                ("status", pyarrow.string()),
+            ]
+        )
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    def header(self):
+        self._writer = self._pa.ipc.new_stream(self._sink, self._schema)
+        return self._sink.drain()
+
+    def encode(self, rows):
+        ids, tasks, statuses = zip(*rows)
+        batch = self._pa.record_batch(
+            [
+                self._pa.array(ids, self._pa.int32()),
+                self._pa.array(tasks, self._pa.string()),
+                self._pa.array(statuses, self._pa.string()),
+            ],
+            schema=self._schema,
+        )
+        self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def footer(self):
+        self._writer.close()
+        return self._sink.drain()
+
+
+EXPORT_FORMATS = {
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+    "arrow": ArrowEncoder,
+}
+
+
+def export_query(owner_id, status=None, since_id=0):
+    """Build the keyset query for an export (ordered by id for resumability)"""
+    query = "SELECT id, task, status FROM todos WHERE owner_id = %s AND id > %s"
+    params = [owner_id, since_id]
+    if status:
+        query += " AND status = %s"
+        params.append(status)
+    query += " ORDER BY id"
+    return query, params
+
+
+def iter_chunks(cursor, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of rows from an executed cursor until it is exhausted"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def encode_stream(encoder, chunks):
+    """Yield the encoded byte stream for an iterable of row chunks"""
+    header = encoder.header()
+    if header:
+        yield header
+    for rows in chunks:
+        yield encoder.encode(rows)
+    footer = encoder.footer()
+    if footer:
+        yield footer
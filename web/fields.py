@@ -0,0 +1,61 @@
+"""Parsing and formatting for the optional task fields: priority and due_at
+
+Priority is an integer from 0 to 9, where higher is more urgent. Tasks
+without a due date are stored with NO_DUE_DATE rather than NULL. That keeps
+``ORDER BY priority DESC, due_at, id`` a plain walk of the
+(owner_id, status, priority, due_at, id) index, with undated tasks after
+every dated one. The API shows NO_DUE_DATE as null.
+"""
+
+from datetime import datetime, timezone
+
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+DEFAULT_PRIORITY = 0
+NO_DUE_DATE = datetime(9999, 12, 31, 23, 59, 59)
+
+
+def parse_priority(value):
+    """Validate a priority from JSON or CSV; missing or blank means default"""
+    if value is None or value == "":
+        return DEFAULT_PRIORITY
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError("Priority must be an integer")
+    if not MIN_PRIORITY <= value <= MAX_PRIORITY:
+        raise ValueError(f"Priority must be between {MIN_PRIORITY} and {MAX_PRIORITY}")
+    return value
+
+
+def parse_due_at(value):
+    """Parse an ISO 8601 due date; missing or blank means no due date
+
+    Times with an offset are converted to UTC; times without one are taken
+    as UTC already. DATETIME columns store no time zone.
+    """
+    if value is None or value == "":
+        return NO_DUE_DATE
+    if not isinstance(value, str):
+        raise ValueError("due_at must be an ISO 8601 date or datetime string")
+    try:
+        due_at = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError("due_at must be an ISO 8601 date or datetime string")
+    if due_at.tzinfo is not None:
+        try:
+            due_at = due_at.astimezone(timezone.utc).replace(tzinfo=None)
+        except OverflowError:
+            # The UTC equivalent falls outside year 1-9999
+            raise ValueError("due_at is out of range")
+    due_at = due_at.replace(microsecond=0)
+    if due_at >= NO_DUE_DATE or due_at.year < 1000:
+        raise ValueError("due_at is out of range")
+    return due_at
+
+
+def format_due_at(due_at):
+    """Render a stored due_at for the API (null when there is none)"""
+    if due_at is None or due_at == NO_DUE_DATE:
+        return None
+    return due_at.isoformat()
@@ -0,0 +1,93 @@
+"""In-process counters, gauges and histograms exposed through /metrics"""
+
+import threading
+from bisect import bisect_left
+from collections import deque
+
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Metrics:
+    """Thread-safe registry of named counters, gauges and fixed-bucket histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def incr(self, name, value=1):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS):
+        """Record a value in a histogram (buckets are fixed on first use)"""
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = {
+                    "buckets": tuple(buckets),
+                    "counts": [0] * (len(buckets) + 1),
+                    "count": 0,
+                    "sum": 0,
+                }
+                self._histograms[name] = hist
+            hist["counts"][bisect_left(hist["buckets"], value)] += 1
+            hist["count"] += 1
+            hist["sum"] += value
+
+    def snapshot(self):
+        """Return a JSON-serialisable copy of all metrics"""
+        with self._lock:
+            histograms = {}
+            for name, hist in self._histograms.items():
+                labels = [f"le_{b}" for b in hist["buckets"]] + ["le_inf"]
+                histograms[name] = {
+                    "count": hist["count"],
+                    "sum": hist["sum"],
+                    "buckets": dict(zip(labels, hist["counts"])),
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": histograms,
+            }
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+class LatencyWindow:
+    """Sliding window of the most recent latency samples"""
+
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+
+    def observe(self, value):
+        with self._lock:
+            self._samples.append(value)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-1) of the window, or None if empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+metrics = Metrics()
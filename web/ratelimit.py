@@ -0,0 +1,166 @@
+"""Token-bucket rate limiting and adaptive concurrency limits for the app tier
+
+Requests draw cost-weighted tokens from two buckets: one per client and one per
+endpoint, so an expensive route such as /list (a full-table scan) uses up its
+budget long before cheap ones like /tasks. Independently, an AIMD concurrency
+limit shrinks while database latency is above target and grows back when it
+recovers; requests over the limit are shed instead of queueing on the DB.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Token cost per Flask endpoint; anything unlisted costs DEFAULT_COST
+ENDPOINT_COSTS = {
+    "todo.list_all": 10,
+    "todo.get_tasks_api": 2,
+    "todo.import_tasks": 20,
+}
+DEFAULT_COST = 1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens/second"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost):
+        """Seconds until ``cost`` tokens are available (0 if they are now)
+
+        A cost above the bucket's capacity is charged as a full bucket, so it
+        can still succeed instead of being refused forever.
+        """
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost):
+        self.tokens -= min(cost, self.capacity)
+
+
+class RateLimiter:
+    """Per-client and per-endpoint token buckets with cost weights
+
+    Client buckets are kept in LRU order and capped at ``max_clients`` so a
+    scan from many addresses cannot grow memory without bound.
+    """
+
+    def __init__(
+        self,
+        client_rate,
+        client_burst,
+        endpoint_rate,
+        endpoint_burst,
+        costs=None,
+        max_clients=10000,
+    ):
+        if client_rate <= 0 or endpoint_rate <= 0:
+            raise ValueError("Rate limit rates must be greater than zero")
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_burst = endpoint_burst
+        self.costs = ENDPOINT_COSTS if costs is None else costs
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._endpoints = {}
+
+    def cost(self, endpoint):
+        return self.costs.get(endpoint, DEFAULT_COST)
+
+    def acquire(self, client, endpoint, now=None):
+        """Take tokens for one request; return (allowed, retry_after_seconds)"""
+        now = time.monotonic() if now is None else now
+        cost = self.cost(endpoint)
+        with self._lock:
+            client_bucket = self._clients.get(client)
+            if client_bucket is None:
+                client_bucket = TokenBucket(self.client_rate, self.client_burst, now)
+                self._clients[client] = client_bucket
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(client)
+            endpoint_bucket = self._endpoints.get(endpoint)
+            if endpoint_bucket is None:
+                endpoint_bucket = TokenBucket(
+                    self.endpoint_rate, self.endpoint_burst, now
+                )
+                self._endpoints[endpoint] = endpoint_bucket
+
+            client_bucket.refill(now)
+            endpoint_bucket.refill(now)
+            wait = max(client_bucket.wait_time(cost), endpoint_bucket.wait_time(cost))
+            if wait > 0:
+                return False, wait
+            client_bucket.take(cost)
+            endpoint_bucket.take(cost)
+            return True, 0.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit driven by recent database latency
+
+    Every ``window`` latency samples the p90 is compared with the target: above
+    it the limit is multiplied by ``backoff``, otherwise it grows by one.
+    """
+
+    def __init__(
+        self,
+        target_latency_ms,
+        min_limit=4,
+        max_limit=64,
+        window=50,
+        backoff=0.75,
+    ):
+        self.target_latency_ms = target_latency_ms
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.window = window
+        self.limit = max_limit
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._samples = []
+
+    def try_acquire(self):
+        with self._lock:
+            if self.inflight >= self.limit:
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+
+    def observe(self, latency_ms):
+        """Feed a DB latency sample and adjust the limit once per window"""
+        with self._lock:
+            self._samples.append(latency_ms)
+            if len(self._samples) < self.window:
+                return
+            samples = sorted(self._samples)
+            self._samples = []
+            p90 = samples[int(0.9 * (len(samples) - 1))]
+            if p90 > self.target_latency_ms:
+                self.limit = max(self.min_limit, int(self.limit * self.backoff))
+            else:
+                self.limit = min(self.max_limit, self.limit + 1)
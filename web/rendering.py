@@ -0,0 +1,97 @@
+"""HTML rendering for the browser views
+
+Templates are compiled once at import, the static index page is rendered once
+and kept as encoded bytes, and /list rows are cached as encoded fragments
+keyed by (id, status, hash of the task text), so rows that have not changed
+are never rendered again. All task text goes through markupsafe's C escaper.
+"""
+
+import threading
+from collections import OrderedDict
+
+from jinja2 import Environment
+from markupsafe import escape
+
+from metrics import metrics
+
+_env = Environment(autoescape=True)
+
+INDEX_TEMPLATE = _env.from_string("""
+        <h1>Todo API</h1>
+        <form action="/add_from_browser" method="post">
+            <input type="text" name="task" placeholder="Enter a task" required>
+            <button type="submit">Add Task</button>
+        </form>
+        <br>
+        <a href="/list"><button>View All Tasks</button></a>
+    """)
+
+MESSAGE_TEMPLATE = _env.from_string(
+    '<h2>{{ message }}</h2> <a href="{{ link }}">{{ link_text }}</a>'
+)
+
+LIST_HEADER = b"""
+            <h1>Todo List</h1>
+            <table border="1" cellpadding="10">
+                <tr><th>ID</th><th>Task</th><th>Status</th><th>Actions</th></tr>
+        """
+
+LIST_FOOTER = b"""
+            </table>
+            <br><a href="/"><button>Back</button></a>
+        """
+
+_ROW = "<tr><td>%d</td><td>%s</td><td>%s</td><td>%s</td></tr>"
+_DELETE_ACTION = '<a href="/delete/%d">Delete</a>'
+_COMPLETE_ACTION = ' | <a href="/complete/%d">Mark Complete</a>'
+
+INDEX_PAGE = INDEX_TEMPLATE.render().encode("utf-8")
+
+
+def render_row(task_id, task, status):
+    """Render one /list table row as encoded bytes"""
+    actions = _DELETE_ACTION % task_id
+    if status == "pending":
+        actions += _COMPLETE_ACTION % task_id
+    return (_ROW % (task_id, escape(task), escape(status), actions)).encode("utf-8")
+
+
+def render_message(message, link="/", link_text="Go back"):
+    """Render a short status page with an escaped message and a link"""
+    return MESSAGE_TEMPLATE.render(message=message, link=link, link_text=link_text)
+
+
+class FragmentCache:
+    """Bounded LRU cache of rendered /list rows"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+
+    def render_list(self, rows):
+        """Render the /list page for (id, task, status) rows; return bytes"""
+        parts = [LIST_HEADER]
+        hits = 0
+        with self._lock:
+            cache = self._rows
+            for task_id, task, status in rows:
+                key = (task_id, status, hash(task))
+                fragment = cache.get(key)
+                if fragment is None:
+                    fragment = render_row(task_id, task, status)
+                    cache[key] = fragment
+                    if len(cache) > self.maxsize:
+                        cache.popitem(last=False)
+                else:
+                    cache.move_to_end(key)
+                    hits += 1
+                parts.append(fragment)
+        metrics.incr("list_fragments_cached_total", hits)
+        metrics.incr("list_fragments_rendered_total", len(parts) - 1 - hits)
+        parts.append(LIST_FOOTER)
+        return b"".join(parts)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
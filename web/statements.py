@@ -0,0 +1,129 @@
+"""Fixed SQL statements and a per-connection cache of prepared cursors
+
+The fixed statements used by the routes are prepared once per pooled
+connection and reused for every request that borrows that connection, so the
+server parses each statement only once per connection instead of once per
+call. Anything not listed here (export filters, multi-row inserts) goes
+through a regular text cursor.
+"""
+
+import threading
+import weakref
+from contextlib import suppress
+
+# Values of the todos.status ENUM
+TASK_STATUSES = ("pending", "completed", "archived")
+
+# Every statement is scoped to one owner and reads one range of an
+# (owner_id, ...) index
+INSERT_TASK = (
+    "INSERT INTO todos (owner_id, task, status, priority, due_at)"
+    " VALUES (%s, %s, %s, %s, %s)"
+)
+SELECT_TASK_ID = "SELECT id FROM todos WHERE owner_id = %s AND id = %s"
+UPDATE_TASK_STATUS = "UPDATE todos SET status = %s WHERE owner_id = %s AND id = %s"
+DELETE_TASK = "DELETE FROM todos WHERE owner_id = %s AND id = %s"
+SELECT_ALL_TASKS = "SELECT id, task, status FROM todos WHERE owner_id = %s ORDER BY id"
+SELECT_TASK_PAGE = (
+    "SELECT id, task, status FROM todos WHERE owner_id = %s"
+    " ORDER BY id LIMIT %s OFFSET %s"
+)
+# The status filter is a bound parameter, so this is one fixed statement and is
+# prepared like the others
+SELECT_STATUS_PAGE = (
+    "SELECT id, task, status FROM todos WHERE owner_id = %s AND status = %s"
+    " ORDER BY id LIMIT %s OFFSET %s"
+)
+# Reads the (owner_id, status, priority DESC, due_at, id) index in order and
+# stops after LIMIT rows: no filesort however many tasks are pending
+SELECT_NEXT_TASKS = (
+    "SELECT id, task, status, priority, due_at FROM todos"
+    " WHERE owner_id = %s AND status = 'pending'"
+    " ORDER BY priority DESC, due_at, id LIMIT %s"
+)
+SELECT_TASK_COUNTS = "SELECT status, total FROM task_counts WHERE owner_id = %s"
+SELECT_OWNED_TASKS = "SELECT owner_id, id, task, status FROM todos ORDER BY id"
+HEALTH_CHECK = "SELECT 1"
+SET_SESSION_TIMEOUTS = (
+    "SET SESSION max_execution_time = %s, innodb_lock_wait_timeout = %s"
+)
+
+
+class StatementCache:
+    """Prepared cursors cached per physical connection
+
+    Pooled connections are wrappers created on every checkout, so the cache
+    is keyed on the underlying connection. If the driver reconnected (its
+    connection id changed) the server has dropped the statements and the
+    cached cursors are rebuilt.
+
+    One-off connections (pooling off or pool exhausted) are closed after a
+    single request, so preparing on them would only add a round trip; they
+    are registered with ``mark_direct`` and get plain text cursors instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursors = weakref.WeakKeyDictionary()
+        self._direct = weakref.WeakSet()
+
+    def mark_direct(self, conn):
+        """Run statements on this unpooled connection without preparing them"""
+        self._direct.add(conn)
+        return conn
+
+    @staticmethod
+    def _physical(conn):
+        return getattr(conn, "_cnx", None) or conn
+
+    def cursor(self, conn, sql, dictionary=False):
+        """Return the cached prepared cursor for sql on this connection"""
+        cnx = self._physical(conn)
+        connection_id = getattr(cnx, "connection_id", None)
+        with self._lock:
+            entry = self._cursors.get(cnx)
+            if entry is None or entry[0] != connection_id:
+                entry = (connection_id, {})
+                self._cursors[cnx] = entry
+            cursors = entry[1]
+        key = (sql, dictionary)
+        cursor = cursors.get(key)
+        if cursor is None:
+            if dictionary:
+                cursor = conn.cursor(prepared=True, dictionary=True)
+            else:
+                cursor = conn.cursor(prepared=True)
+            cursors[key] = cursor
+        return cursor
+
+    def execute(self, conn, sql, params=(), dictionary=False):
+        """Execute a fixed statement through its prepared cursor"""
+        if conn in self._direct:
+            cursor = conn.cursor(buffered=True, dictionary=dictionary)
+            cursor.execute(sql, params)
+            return cursor
+        cursor = self.cursor(conn, sql, dictionary)
+        try:
+            cursor.execute(sql, params)
+        except Exception:
+            self.invalidate(conn)
+            raise
+        return cursor
+
+    def invalidate(self, conn):
+        """Close and forget every cursor prepared on this connection
+
+        Pooled connections outlive any one error, so dropping the cursors
+        without closing them would leave their statements allocated on the
+        server. Closing may fail if the connection is already gone.
+        """
+        with self._lock:
+            entry = self._cursors.pop(self._physical(conn), None)
+        if entry is None:
+            return
+        for cursor in entry[1].values():
+            with suppress(Exception):
+                cursor.close()
+
+
+statement_cache = StatementCache()
@@ -0,0 +1,251 @@
+"""In-process hot copy of the todos table for read-heavy routes
+
+Each owner's tasks are held as ``__slots__`` records keyed by id, plus one
+sorted ``array`` of ids overall and one per status, so a page of /tasks
+(optionally filtered by status) is an array slice and a few dict lookups. The store is
+warmed by streaming the whole table in id order on a background thread. The
+mutating routes write through to it after their MySQL commit. The same thread
+reloads the table every ``refresh_seconds`` to pick up writes made out of
+band (other processes, bulk loads, manual SQL). Writes that land while a
+reload is streaming are journalled and replayed onto the fresh copy before
+it is swapped in, so a reload never loses them.
+"""
+
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from metrics import metrics
+from statements import TASK_STATUSES
+
+
+class TaskRecord:
+    """One cached task"""
+
+    __slots__ = ("id", "task", "status")
+
+    def __init__(self, task_id, task, status):
+        self.id = task_id
+        self.task = task
+        self.status = status
+
+
+def _discard(ids, task_id):
+    index = bisect_left(ids, task_id)
+    if index < len(ids) and ids[index] == task_id:
+        del ids[index]
+
+
+class TaskIndex:
+    """Tasks by id with ordered id lists overall and per status (not locked)"""
+
+    def __init__(self):
+        self.records = {}
+        self.ids = array("q")
+        self.by_status = {status: array("q") for status in TASK_STATUSES}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _status_ids(self, status):
+        ids = self.by_status.get(status)
+        if ids is None:
+            ids = self.by_status[status] = array("q")
+        return ids
+
+    def put(self, task_id, task, status):
+        """Insert or replace a task"""
+        record = self.records.get(task_id)
+        if record is None:
+            self.records[task_id] = TaskRecord(task_id, task, status)
+            # Loads and new inserts arrive in id order, so this is usually an
+            # append rather than a shift
+            if self.ids and self.ids[-1] > task_id:
+                insort(self.ids, task_id)
+            else:
+                self.ids.append(task_id)
+            status_ids = self._status_ids(status)
+            if status_ids and status_ids[-1] > task_id:
+                insort(status_ids, task_id)
+            else:
+                status_ids.append(task_id)
+            return
+        record.task = task
+        self.set_status(task_id, status)
+
+    def set_status(self, task_id, status):
+        """Change a task's status; return False if the task is unknown"""
+        record = self.records.get(task_id)
+        if record is None:
+            return False
+        if record.status != status:
+            _discard(self._status_ids(record.status), task_id)
+            insort(self._status_ids(status), task_id)
+            record.status = status
+        return True
+
+    def remove(self, task_id):
+        """Drop a task; return False if it was unknown"""
+        record = self.records.pop(task_id, None)
+        if record is None:
+            return False
+        _discard(self.ids, task_id)
+        _discard(self._status_ids(record.status), task_id)
+        return True
+
+    def page(self, status, limit, offset):
+        """Return up to limit task dicts after skipping offset, in id order"""
+        ids = self.ids if status is None else self.by_status.get(status, ())
+        end = offset + limit
+        tasks = []
+        for task_id in ids[offset:end]:
+            record = self.records[task_id]
+            tasks.append({"id": task_id, "task": record.task, "status": record.status})
+        return tasks
+
+    def rows(self):
+        """All tasks as (id, task, status) tuples in id order"""
+        records = self.records
+        rows = []
+        for task_id in self.ids:
+            record = records[task_id]
+            rows.append((task_id, record.task, record.status))
+        return rows
+
+    def counts(self):
+        return {status: len(self.by_status[status]) for status in TASK_STATUSES}
+
+    def drift(self, other):
+        """Number of tasks that are missing or different in other"""
+        changed = 0
+        for task_id, record in self.records.items():
+            theirs = other.records.get(task_id)
+            if theirs is None or theirs.task != record.task:
+                changed += 1
+            elif theirs.status != record.status:
+                changed += 1
+        added = sum(1 for task_id in other.records if task_id not in self.records)
+        return changed + added
+
+
+class TaskStore:
+    """Thread-safe TaskIndex per owner, kept warm by a background thread
+
+    ``load_rows`` returns an iterable of row chunks, each a list of
+    (owner_id, id, task, status) tuples, in id order within each owner.
+    """
+
+    def __init__(self, load_rows, refresh_seconds=60.0):
+        self._load_rows = load_rows
+        self.refresh_seconds = refresh_seconds
+        self.ready = False
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._journal = None
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """Warm the store and start periodic reconciliation"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="task-store", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def request_refresh(self):
+        """Reload soon, e.g. after a bulk load whose ids are not known"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Task store refresh failed: {e}")
+                metrics.incr("task_store_refresh_errors_total")
+            self._wakeup.wait(self.refresh_seconds)
+            self._wakeup.clear()
+
+    def refresh(self):
+        """Reload every task from the database; return how many had drifted"""
+        started = time.monotonic()
+        with self._lock:
+            self._journal = []
+        try:
+            indexes = {}
+            for rows in self._load_rows():
+                for owner_id, task_id, task, status in rows:
+                    index = indexes.get(owner_id)
+                    if index is None:
+                        index = indexes[owner_id] = TaskIndex()
+                    index.put(task_id, task, status)
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            for operation, owner_id, args in self._journal:
+                index = indexes.get(owner_id)
+                if index is None:
+                    index = indexes[owner_id] = TaskIndex()
+                getattr(index, operation)(*args)
+            self._journal = None
+            drift = self._drift(indexes) if self.ready else 0
+            self._indexes = indexes
+            self.ready = True
+        metrics.incr("task_store_refresh_total")
+        metrics.incr("task_store_drift_total", drift)
+        metrics.set_gauge("task_store_size", sum(map(len, indexes.values())))
+        metrics.observe("task_store_refresh_ms", (time.monotonic() - started) * 1000.0)
+        if drift:
+            logging.warning(f"Task store reconciled {drift} tasks changed out of band")
+        return drift
+
+    def _drift(self, indexes):
+        empty = TaskIndex()
+        return sum(
+            self._indexes.get(owner_id, empty).drift(indexes.get(owner_id, empty))
+            for owner_id in self._indexes.keys() | indexes.keys()
+        )
+
+    def _write(self, operation, owner_id, *args):
+        with self._lock:
+            index = self._indexes.get(owner_id)
+            if index is None:
+                index = self._indexes[owner_id] = TaskIndex()
+            result = getattr(index, operation)(*args)
+            if self._journal is not None:
+                self._journal.append((operation, owner_id, args))
+        return result
+
+    def _read(self, owner_id):
+        return self._indexes.get(owner_id) or TaskIndex()
+
+    def put(self, owner_id, task_id, task, status):
+        self._write("put", owner_id, task_id, task, status)
+
+    def set_status(self, owner_id, task_id, status):
+        return self._write("set_status", owner_id, task_id, status)
+
+    def remove(self, owner_id, task_id):
+        return self._write("remove", owner_id, task_id)
+
+    def page(self, owner_id, status, limit, offset):
+        with self._lock:
+            return self._read(owner_id).page(status, limit, offset)
+
+    def rows(self, owner_id):
+        with self._lock:
+            return self._read(owner_id).rows()
+
+    def counts(self, owner_id):
+        with self._lock:
+            return self._read(owner_id).counts()
@@ -1,10 +1,49 @@
 import pytest
 import os
+import sys
+import logging
+import subprocess
+import io
+import threading
+import time
+import csv
 import json
 from unittest.mock import patch, MagicMock
-from app import app, validate_task
+from app import (
+    app,
+    create_app,
+    get_db_connection,
+    get_fragment_cache,
+    get_streaming_db,
+    validate_task,
+    LazyFileHandler,
+)
+from batching import InsertBatcher, _PendingInsert
+from circuit import CLOSED, HALF_OPEN, OPEN, AdaptiveTimeout, CircuitBreaker
+from bulk_import import (
+    BulkImporter,
+    Checkpoint,
+    iter_ndjson_records,
+    records_for,
+    validate_batch,
+)
+from bulk_import import main as bulk_import_main
+from fields import NO_DUE_DATE, format_due_at, parse_due_at, parse_priority
+from export import NDJSONEncoder, CSVEncoder, encode_stream, export_query
+from metrics import metrics
+from rendering import INDEX_PAGE, FragmentCache
+from ratelimit import RateLimiter, AdaptiveConcurrencyLimiter
+from statements import (
+    StatementCache,
+    SELECT_TASK_COUNTS,
+    SELECT_TASK_ID,
+    statement_cache,
+)
+from taskstore import TaskIndex, TaskStore
+from tenancy import jump_hash, owner_shard, validate_owner
 import mysql.connector
 from mysql.connector import Error as MySQLError
+from mysql.connector.errors import PoolError
 
 
 @pytest.fixture
@@ -14,6 +53,59 @@ def client():
     return app.test_client()
 
 
+class TestAppFactory:
+    """Test create_app() and lazy startup"""
+
+    def test_config_overrides(self):
+        """Explicit config wins over environment defaults"""
+        test_app = create_app({"DB_POOL_SIZE": 0, "TESTING": True})
+        assert test_app.config["DB_POOL_SIZE"] == 0
+        assert "todo.health" in test_app.view_functions
+
+    def test_apps_are_independent(self):
+        """Each app keeps its own lazily created helpers"""
+        first, second = create_app(), create_app()
+        with first.app_context():
+            cache = get_fragment_cache()
+        with second.app_context():
+            assert get_fragment_cache() is not cache
+
+    def test_import_does_not_load_driver(self):
+        """Importing the app leaves mysql.connector unimported"""
+        code = "import sys, app; print('mysql.connector' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "False"
+
+    def test_log_dir_created_on_first_record(self, tmp_path):
+        """The log directory is only created when something is logged"""
+        log_dir = tmp_path / "logs"
+        handler = LazyFileHandler(str(log_dir))
+        assert not log_dir.exists()
+
+        handler.emit(logging.makeLogRecord({"msg": "hello"}))
+        handler.close()
+
+        assert (log_dir / "app.log").read_text().strip() == "hello"
+
+    def test_log_dir_falls_back_when_not_writable(self, tmp_path):
+        """An uncreatable log directory falls back to the fallback dir"""
+        handler = LazyFileHandler(
+            str(tmp_path / "denied"), fallback_dir=str(tmp_path / "fallback")
+        )
+        with patch("app.os.makedirs", side_effect=[PermissionError, None]):
+            (tmp_path / "fallback").mkdir()
+            handler.emit(logging.makeLogRecord({"msg": "hello"}))
+        handler.close()
+
+        assert (tmp_path / "fallback" / "app.log").exists()
+
+
 class TestInputValidation:
     """Test input validation functions"""
 
@@ -141,6 +233,599 @@ class TestAddEndpoint:
         assert data["error"] == "Database error"
 
 
+def make_db_context(cursor):
+    """Build a get_db()/get_streaming_db() replacement yielding cursor's connection"""
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    context = MagicMock()
+    context.__enter__ = MagicMock(return_value=connection)
+    context.__exit__ = MagicMock(return_value=None)
+    return MagicMock(return_value=context)
+
+
+class TestInsertBatching:
+    """Test write-behind group commit for inserts"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_flush_assigns_consecutive_ids(self):
+        """One multi-row INSERT is issued and ids follow the first row id"""
+        cursor = MagicMock()
+        cursor.lastrowid = 10
+        batcher = InsertBatcher(make_db_context(cursor))
+        batch = [_PendingInsert(t, "pending") for t in "abc"]
+
+        batcher.flush(batch)
+
+        assert [p.task_id for p in batch] == [10, 11, 12]
+        assert all(p.done.is_set() for p in batch)
+        sql, params = cursor.execute.call_args[0]
+        assert sql.count("(%s, %s, %s, %s, %s)") == 3
+        assert params[:5] == ["default", "a", "pending", 0, NO_DUE_DATE]
+        assert params[6] == "b"
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["insert_batches_total"] == 1
+        assert snapshot["histograms"]["insert_batch_size"]["count"] == 1
+
+    def test_flush_error_reaches_every_caller(self):
+        """A failed batch reports the error to every waiting request"""
+        get_db = MagicMock(side_effect=MySQLError("Connection error"))
+        batcher = InsertBatcher(get_db)
+        batch = [_PendingInsert(t, "pending") for t in "ab"]
+
+        batcher.flush(batch)
+
+        assert all(isinstance(p.error, MySQLError) for p in batch)
+        assert metrics.snapshot()["counters"]["insert_batch_errors_total"] == 1
+
+    def test_submit_returns_task_id(self):
+        """submit() blocks until the writer thread commits the row"""
+        cursor = MagicMock()
+        cursor.lastrowid = 7
+        batcher = InsertBatcher(make_db_context(cursor), max_latency_ms=1)
+
+        assert batcher.submit("Buy milk") == 7
+
+    def test_timed_out_row_is_withdrawn(self):
+        """A caller that gives up before its batch starts is never written"""
+        cursor = MagicMock()
+        cursor.lastrowid = 3
+        batcher = InsertBatcher(make_db_context(cursor), timeout_ms=10)
+        batcher._ensure_started = MagicMock()  # no writer thread: nothing flushes
+
+        with pytest.raises(TimeoutError):
+            batcher.submit("Buy milk")
+        pending = batcher._queue.get_nowait()
+        batcher.flush([pending, _PendingInsert("Buy eggs", "pending")])
+
+        assert pending.abandoned
+        sql, params = cursor.execute.call_args[0]
+        assert sql.count("(%s, %s, %s, %s, %s)") == 1
+        assert params[1] == "Buy eggs"
+        assert metrics.snapshot()["counters"]["insert_batch_timeouts_total"] == 1
+
+    def test_timeout_waits_for_claimed_row(self):
+        """A row already being flushed is waited for instead of timing out"""
+        batcher = InsertBatcher(MagicMock(), timeout_ms=1)
+        batcher._ensure_started = MagicMock()
+
+        def claim_and_commit(pending):
+            pending.claimed = True
+            pending.task_id = 42
+            threading.Timer(0.05, pending.done.set).start()
+
+        batcher._queue.put = claim_and_commit
+
+        assert batcher.submit("Buy milk") == 42
+
+    def test_add_timeout_returns_503(self, client):
+        """A withdrawn batched insert tells the client to retry"""
+        batcher = MagicMock()
+        batcher.submit.side_effect = TimeoutError("Timed out")
+        with patch.dict(app.config, {"INSERT_BATCH_ENABLED": True}), patch(
+            "app.get_insert_batcher", return_value=batcher
+        ):
+            response = client.post("/add", json={"task": "Buy milk"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_invalid_batch_size(self):
+        """A batch size below one is rejected"""
+        with pytest.raises(ValueError):
+            InsertBatcher(MagicMock(), max_batch_size=0)
+
+    def test_add_uses_batcher_when_enabled(self, client):
+        """/add goes through the batcher in group-commit mode"""
+        batcher = MagicMock()
+        batcher.submit.return_value = 99
+        with patch.dict(app.config, {"INSERT_BATCH_ENABLED": True}), patch(
+            "app.get_insert_batcher", return_value=batcher
+        ):
+            response = client.post("/add", json={"task": "Buy milk"})
+
+        assert response.status_code == 201
+        assert json.loads(response.data)["task_id"] == 99
+        batcher.submit.assert_called_once_with(
+            "Buy milk", owner_id="default", priority=0, due_at=NO_DUE_DATE
+        )
+
+    def test_metrics_endpoint(self, client):
+        """/metrics exposes counters and histograms"""
+        metrics.incr("insert_batches_total")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["counters"]["insert_batches_total"] == 1
+        assert "histograms" in data
+
+
+class TestPreparedStatements:
+    """Test the per-connection prepared cursor cache"""
+
+    def test_cursor_reused_per_connection(self):
+        """The same statement on the same connection reuses its cursor"""
+        cache = StatementCache()
+        conn = MagicMock()
+
+        first = cache.execute(conn, SELECT_TASK_ID, (1,))
+        second = cache.execute(conn, SELECT_TASK_ID, (2,))
+
+        assert first is second
+        conn.cursor.assert_called_once_with(prepared=True)
+        assert first.execute.call_count == 2
+
+    def test_cache_keyed_on_physical_connection(self):
+        """Pool wrappers around the same connection share cached cursors"""
+        cache = StatementCache()
+        physical = MagicMock()
+        wrapper_a, wrapper_b = MagicMock(_cnx=physical), MagicMock(_cnx=physical)
+
+        assert cache.cursor(wrapper_a, SELECT_TASK_ID) is cache.cursor(
+            wrapper_b, SELECT_TASK_ID
+        )
+
+    def test_reconnect_rebuilds_cursors(self):
+        """A new server connection id drops the stale prepared cursors"""
+        cache = StatementCache()
+        conn = MagicMock(connection_id=1)
+        conn.cursor.side_effect = [MagicMock(), MagicMock()]
+
+        first = cache.cursor(conn, SELECT_TASK_ID)
+        conn._cnx.connection_id = 2
+
+        assert cache.cursor(conn, SELECT_TASK_ID) is not first
+
+    def test_error_invalidates_connection(self):
+        """A failing execute discards the connection's cursors"""
+        cache = StatementCache()
+        conn = MagicMock()
+        failing = MagicMock()
+        failing.execute.side_effect = MySQLError("Lost connection")
+        conn.cursor.side_effect = [failing, MagicMock()]
+
+        with pytest.raises(MySQLError):
+            cache.execute(conn, SELECT_TASK_ID, (1,))
+
+        assert cache.cursor(conn, SELECT_TASK_ID) is not failing
+
+    def test_invalidate_closes_cursors(self):
+        """Dropped cursors are closed so the server frees their statements"""
+        cache = StatementCache()
+        conn = MagicMock()
+        failing, other = MagicMock(), MagicMock()
+        failing.execute.side_effect = MySQLError("Query execution was interrupted")
+        other.close.side_effect = MySQLError("Lost connection")
+        conn.cursor.side_effect = [other, failing]
+        cache.execute(conn, SELECT_TASK_COUNTS, ("default",))
+
+        with pytest.raises(MySQLError, match="interrupted"):
+            cache.execute(conn, SELECT_TASK_ID, ("default", 1))
+
+        failing.close.assert_called_once_with()
+        other.close.assert_called_once_with()
+
+    @patch("mysql.connector.connect")
+    @patch("app.get_pool")
+    def test_pool_exhausted_falls_back_to_direct_connection(
+        self, mock_pool, mock_connect
+    ):
+        """An exhausted pool opens a one-off connection instead of failing"""
+        mock_pool.return_value.get_connection.side_effect = PoolError("exhausted")
+        with app.app_context():
+            assert get_db_connection() is mock_connect.return_value
+
+    def test_direct_connection_uses_text_cursor(self):
+        """One-off connections are not worth a prepare round trip"""
+        cache = StatementCache()
+        conn = cache.mark_direct(MagicMock())
+
+        cursor = cache.execute(conn, SELECT_TASK_ID, ("default", 1))
+
+        conn.cursor.assert_called_once_with(buffered=True, dictionary=False)
+        cursor.execute.assert_called_once_with(SELECT_TASK_ID, ("default", 1))
+        assert cache.execute(conn, SELECT_TASK_ID, ("default", 2)) is not None
+        assert conn.cursor.call_count == 2
+
+    @patch("mysql.connector.connect")
+    def test_unpooled_connections_are_marked_direct(self, mock_connect):
+        """DB_POOL_SIZE=0 connections skip the prepared statement cache"""
+        with patch.dict(app.config, {"DB_POOL_SIZE": 0}), app.app_context():
+            conn = get_db_connection()
+        assert conn in statement_cache._direct
+
+
+class TestRateLimiting:
+    """Test token-bucket rate limiting and load shedding"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_cost_weighted_buckets(self):
+        """Expensive endpoints drain the client bucket faster"""
+        limiter = RateLimiter(
+            client_rate=1, client_burst=10, endpoint_rate=100, endpoint_burst=100
+        )
+
+        assert limiter.acquire("10.0.0.1", "todo.list_all", now=0)[0] is True
+        allowed, retry_after = limiter.acquire("10.0.0.1", "todo.list_all", now=0)
+        assert allowed is False
+        assert retry_after == pytest.approx(10)
+        # Another client has its own bucket
+        assert limiter.acquire("10.0.0.2", "todo.list_all", now=0)[0] is True
+        # Tokens refill over time
+        assert limiter.acquire("10.0.0.1", "todo.list_all", now=10)[0] is True
+
+    def test_endpoint_bucket_shared_by_clients(self):
+        """The per-endpoint bucket caps an endpoint across all clients"""
+        limiter = RateLimiter(
+            client_rate=100, client_burst=100, endpoint_rate=1, endpoint_burst=2
+        )
+
+        assert limiter.acquire("a", "todo.add", now=0)[0] is True
+        assert limiter.acquire("b", "todo.add", now=0)[0] is True
+        assert limiter.acquire("c", "todo.add", now=0)[0] is False
+        assert limiter.acquire("c", "todo.get_task_stats", now=0)[0] is True
+
+    def test_cost_above_burst_is_clamped(self):
+        """A cost larger than the bucket is charged as a full bucket"""
+        limiter = RateLimiter(
+            client_rate=1, client_burst=5, endpoint_rate=100, endpoint_burst=100
+        )
+
+        assert limiter.acquire("a", "todo.list_all", now=0)[0] is True
+        allowed, retry_after = limiter.acquire("a", "todo.list_all", now=0)
+        assert allowed is False
+        assert retry_after == pytest.approx(5)
+        assert limiter.acquire("a", "todo.list_all", now=5)[0] is True
+
+    def test_zero_rate_rejected(self):
+        """A bucket that never refills is a configuration error"""
+        with pytest.raises(ValueError):
+            RateLimiter(
+                client_rate=0, client_burst=10, endpoint_rate=1, endpoint_burst=1
+            )
+
+    def test_retry_after_is_capped(self, client):
+        """An unbounded wait still yields a finite Retry-After header"""
+        limiter = MagicMock()
+        limiter.acquire.return_value = (False, float("inf"))
+        with patch.dict(app.config, {"RATE_LIMIT_ENABLED": True}), patch(
+            "app.get_rate_limiter", return_value=limiter
+        ):
+            response = client.get("/tasks/stats")
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3600"
+
+    def test_client_buckets_bounded(self):
+        """Least recently seen clients are evicted past max_clients"""
+        limiter = RateLimiter(1, 1, 100, 100, max_clients=2)
+        for client in ("a", "b", "c"):
+            limiter.acquire(client, "add", now=0)
+        assert list(limiter._clients) == ["b", "c"]
+
+    def test_concurrency_limit_adapts_to_latency(self):
+        """Slow DB windows shrink the limit, fast ones grow it back"""
+        limiter = AdaptiveConcurrencyLimiter(
+            target_latency_ms=50, min_limit=2, max_limit=8, window=4
+        )
+        for _ in range(4):
+            limiter.observe(200)
+        assert limiter.limit == 6
+        for _ in range(4):
+            limiter.observe(5)
+        assert limiter.limit == 7
+
+    def test_concurrency_limit_rejects_over_limit(self):
+        """try_acquire fails once inflight reaches the limit"""
+        limiter = AdaptiveConcurrencyLimiter(50, min_limit=1, max_limit=1)
+        assert limiter.try_acquire() is True
+        assert limiter.try_acquire() is False
+        limiter.release()
+        assert limiter.try_acquire() is True
+
+    def test_rate_limited_request_gets_429(self, client):
+        """Requests over budget get 429 with Retry-After and are counted"""
+        limiter = RateLimiter(1, 10, 100, 100)
+        with patch.dict(app.config, {"RATE_LIMIT_ENABLED": True}), patch.dict(
+            app.extensions, {"rate_limiter": limiter}
+        ):
+            client.get("/list", headers={"X-Real-IP": "10.0.0.9"})
+            with patch("app.get_db") as mock_get_db:
+                response = client.get("/list", headers={"X-Real-IP": "10.0.0.9"})
+                mock_get_db.assert_not_called()
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        counters = metrics.snapshot()["counters"]
+        assert counters["requests_shed_total.rate_limited.todo.list_all"] == 1
+
+    def test_overloaded_request_gets_503(self, client):
+        """Requests over the concurrency limit are shed with 503"""
+        limiter = AdaptiveConcurrencyLimiter(50, min_limit=1, max_limit=1)
+        limiter.try_acquire()
+        with patch.dict(app.config, {"LOAD_SHED_ENABLED": True}), patch.dict(
+            app.extensions, {"concurrency_limiter": limiter}
+        ):
+            response = client.get("/tasks")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert metrics.snapshot()["counters"]["requests_shed_total"] == 1
+
+    @patch("app.get_db_connection")
+    def test_health_is_never_shed(self, mock_conn, client):
+        """/health bypasses both the rate limiter and the concurrency limit"""
+        limiter = AdaptiveConcurrencyLimiter(50, min_limit=1, max_limit=1)
+        limiter.try_acquire()
+        rate_limiter = MagicMock()
+        rate_limiter.acquire.return_value = (False, 1.0)
+        with patch.dict(
+            app.config, {"LOAD_SHED_ENABLED": True, "RATE_LIMIT_ENABLED": True}
+        ), patch.dict(
+            app.extensions,
+            {"concurrency_limiter": limiter, "rate_limiter": rate_limiter},
+        ):
+            response = client.get("/health")
+
+        assert response.status_code == 200
+        rate_limiter.acquire.assert_not_called()
+
+    def test_slot_released_after_request(self, client):
+        """The concurrency slot is returned when the request finishes"""
+        limiter = AdaptiveConcurrencyLimiter(50, min_limit=1, max_limit=1)
+        with patch.dict(app.config, {"LOAD_SHED_ENABLED": True}), patch.dict(
+            app.extensions, {"concurrency_limiter": limiter}
+        ):
+            client.get("/")
+
+        assert limiter.inflight == 0
+
+
+class TestCircuitBreaker:
+    """Test the database circuit breaker and adaptive timeouts"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_opens_on_error_rate(self):
+        """The breaker opens once enough calls in the window have failed"""
+        breaker = CircuitBreaker(failure_threshold=0.5, min_calls=4)
+        for failed in (False, True, False):
+            breaker.record(5, failed=failed, now=0)
+        assert breaker.state == CLOSED
+        breaker.record(5, failed=True, now=0)
+        assert breaker.state == OPEN
+        assert breaker.allow(now=1) is False
+        assert breaker.retry_after(now=4) == pytest.approx(6)
+
+    def test_opens_on_slow_calls(self):
+        """A database that answers, but too slowly, also opens the breaker"""
+        breaker = CircuitBreaker(slow_call_ms=100, slow_call_threshold=0.5, min_calls=2)
+        breaker.record(500, now=0)
+        breaker.record(500, now=0)
+        assert breaker.state == OPEN
+
+    def test_half_open_admits_one_probe(self):
+        """After the cooldown one probe decides whether to close or re-open"""
+        breaker = CircuitBreaker(min_calls=1, open_seconds=10)
+        breaker.record(5, failed=True, now=0)
+
+        assert breaker.allow(now=10) is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow(now=10) is False
+        breaker.record(5, failed=True, now=11)
+        assert breaker.state == OPEN
+
+        assert breaker.allow(now=21) is True
+        breaker.record(5, now=21)
+        assert breaker.state == CLOSED
+        assert breaker.snapshot(now=21)["calls"] == 0
+
+    def test_release_probe_frees_half_open_slot(self):
+        """A probe that never reached the DB hands the slot to the next call"""
+        breaker = CircuitBreaker(min_calls=1, open_seconds=10)
+        breaker.record(5, failed=True, now=0)
+
+        allowed, probe = breaker.acquire(now=10)
+        assert allowed and probe is not None
+        assert breaker.allow(now=10) is False
+        breaker.release_probe(probe)
+        assert breaker.allow(now=10) is True
+
+    def test_unresolved_probe_released_after_request(self, client):
+        """A probe request rejected before any DB call frees the slot"""
+        breaker = CircuitBreaker(min_calls=1, open_seconds=0.01)
+        breaker.record(5, failed=True)
+        time.sleep(0.02)
+        with patch.dict(app.config, {"CIRCUIT_BREAKER_ENABLED": True}), patch.dict(
+            app.extensions, {"circuit_breaker.0": breaker}
+        ):
+            response = client.post("/add", json={"task": ""})
+
+        assert response.status_code == 400
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is True
+
+    @patch("mysql.connector.connect")
+    def test_streaming_db_reports_to_breaker(self, mock_connect):
+        """Export connections count toward the breaker like get_db()"""
+        breaker = MagicMock()
+        with patch.dict(app.config, {"CIRCUIT_BREAKER_ENABLED": True}), patch.dict(
+            app.extensions, {"circuit_breaker.0": breaker}
+        ), app.app_context():
+            with pytest.raises(MySQLError):
+                with get_streaming_db():
+                    raise MySQLError("Lost connection")
+            with get_streaming_db():
+                pass
+
+        outcomes = [call.args[1] for call in breaker.record.call_args_list]
+        assert outcomes == [True, False]
+
+    def test_timeout_follows_p99(self):
+        """Timeouts are the clamped p99 times the multiplier, in 100 ms steps"""
+        timeouts = AdaptiveTimeout(
+            multiplier=4, min_ms=200, max_ms=5000, min_samples=10
+        )
+        assert timeouts.timeout_ms() == 5000
+        for _ in range(20):
+            timeouts.observe(120)
+        assert timeouts.timeout_ms() == 500
+        assert timeouts.connect_timeout() == 1
+        for _ in range(20):
+            timeouts.observe(1)
+        assert timeouts.timeout_ms() == 500
+
+    def test_session_timeout_set_once_per_connection(self):
+        """The SET is only sent again when the timeout changes"""
+        timeouts = AdaptiveTimeout(min_samples=1)
+        conn = MagicMock()
+        timeouts.apply(conn)
+        timeouts.apply(conn)
+        assert conn.cursor.return_value.execute.call_count == 1
+        conn.cursor.return_value.execute.assert_called_with(
+            "SET SESSION max_execution_time = %s, innodb_lock_wait_timeout = %s",
+            (5000, 5),
+        )
+        timeouts.observe(10)
+        timeouts.apply(conn)
+        assert conn.cursor.return_value.execute.call_count == 2
+
+    @patch("app.get_db_connection")
+    def test_db_errors_trip_breaker(self, mock_conn, client):
+        """Failures inside get_db() open the breaker; later requests fail fast"""
+        breaker = CircuitBreaker(min_calls=2)
+        mock_conn.side_effect = MySQLError("Lost connection")
+        with patch.dict(app.config, {"CIRCUIT_BREAKER_ENABLED": True}), patch.dict(
+            app.extensions, {"circuit_breaker.0": breaker}
+        ):
+            client.get("/tasks")
+            client.get("/tasks/stats")
+            response = client.get("/tasks")
+            index = client.get("/")
+
+        assert mock_conn.call_count == 2
+        assert response.status_code == 503
+        assert json.loads(response.data)["error"] == "Database unavailable, retry later"
+        assert int(response.headers["Retry-After"]) >= 1
+        assert index.status_code == 200
+        counters = metrics.snapshot()["counters"]
+        assert counters["requests_shed_total.circuit_open.todo.get_tasks_api"] == 1
+
+    @patch("app.get_db_connection")
+    def test_health_reports_circuit(self, mock_conn, client):
+        """/health still probes the DB and reports the breaker state"""
+        breaker = CircuitBreaker(min_calls=1)
+        breaker.record(5, failed=True)
+        with patch.dict(app.config, {"CIRCUIT_BREAKER_ENABLED": True}), patch.dict(
+            app.extensions, {"circuit_breaker.0": breaker}
+        ):
+            response = client.get("/health")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["status"] == "degraded"
+        assert data["circuit"]["state"] == OPEN
+
+
+class TestMultiTenancy:
+    """Test owner scoping and owner-to-shard routing"""
+
+    SHARDS = {"DB_SHARD_HOSTS": ["db-0", "db-1", "db-2"]}
+
+    def test_validate_owner(self):
+        """Owner ids are short names without spaces or quotes"""
+        assert validate_owner("team-a@example.com") == "team-a@example.com"
+        for owner_id in ("", "a b", "x" * 65, "robert'); --", None):
+            with pytest.raises(ValueError):
+                validate_owner(owner_id)
+
+    def test_owner_shard_is_stable_and_spread(self):
+        """Owners map to the same shard every time and spread evenly"""
+        assert owner_shard("team-a", 1) == 0
+        assert owner_shard("team-a", 4) == owner_shard("team-a", 4)
+        placement = [owner_shard(f"team-{i}", 4) for i in range(4000)]
+        assert all(800 < placement.count(shard) < 1200 for shard in range(4))
+
+    def test_adding_a_shard_moves_few_owners(self):
+        """Jump hashing only moves owners onto the new shard"""
+        for key in range(1000):
+            before, after = jump_hash(key, 4), jump_hash(key, 5)
+            assert after == before or after == 4
+
+    def test_invalid_owner_header_rejected(self, client):
+        """A malformed X-Owner-Id is a 400, before any database work"""
+        with patch("app.get_db") as mock_get_db:
+            response = client.get("/tasks", headers={"X-Owner-Id": "a b"})
+            mock_get_db.assert_not_called()
+        assert response.status_code == 400
+
+    def test_queries_scoped_to_owner(self, client):
+        """Routes pass the caller's owner id into every statement"""
+        cursor = MagicMock()
+        cursor.fetchone.return_value = (5,)
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.post("/complete/5", headers={"X-Owner-Id": "team-a"})
+
+        assert response.status_code == 200
+        params = [c[0][1] for c in cursor.execute.call_args_list]
+        assert params == [("team-a", 5), ("completed", "team-a", 5)]
+
+    @patch("app.get_db_connection")
+    def test_owner_routed_to_its_shard(self, mock_conn, client):
+        """With several hosts each owner's queries go to its own shard"""
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetchall.return_value = []
+        with patch.dict(app.config, self.SHARDS):
+            client.get("/tasks/stats", headers={"X-Owner-Id": "team-a"})
+            with app.app_context():
+                connect = patch("mysql.connector.connect")
+                with connect as mock_connect, patch("app.get_pool") as mock_pool:
+                    mock_pool.side_effect = PoolError("exhausted")
+                    get_db_connection(2)
+
+        mock_conn.assert_called_once_with(owner_shard("team-a", 3))
+        assert mock_connect.call_args[1]["host"] == "db-2"
+
+    @patch("app.get_db_connection")
+    def test_health_reports_every_shard(self, mock_conn, client):
+        """/health probes each shard and is unhealthy if any shard is down"""
+        mock_conn.side_effect = [MagicMock(), MySQLError("down"), MagicMock()]
+        with patch.dict(app.config, self.SHARDS):
+            response = client.get("/health")
+
+        assert response.status_code == 503
+        data = json.loads(response.data)
+        assert [shard["status"] for shard in data["shards"]] == [
+            "healthy",
+            "unhealthy",
+            "healthy",
+        ]
+
+
 class TestListEndpoint:
     """Test /list endpoint (HTML view)"""
 
@@ -179,6 +864,194 @@ class TestListEndpoint:
         assert b"pending" in response.data
 
 
+class TestRendering:
+    """Test cached, escaped HTML rendering"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_index_served_from_prerendered_bytes(self, client):
+        """The home page is the bytes rendered at startup"""
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.data == INDEX_PAGE
+        assert b"Todo API" in response.data
+
+    def test_list_escapes_task_text(self, client):
+        """Markup in task text is escaped in /list"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(1, "<script>alert(1)</script>", "pending")]
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.get("/list")
+
+        assert b"<script>" not in response.data
+        assert b"&lt;script&gt;alert(1)&lt;/script&gt;" in response.data
+        assert b'href="/complete/1"' in response.data
+
+    def test_add_from_browser_escapes_task(self, client):
+        """The confirmation page escapes the submitted task"""
+        with patch("app.insert_task", return_value=1):
+            response = client.post(
+                "/add_from_browser", data={"task": "<img src=x onerror=alert(1)>"}
+            )
+
+        assert response.status_code == 200
+        assert b"<img" not in response.data
+        assert b"&lt;img" in response.data
+
+    def test_unchanged_rows_served_from_cache(self):
+        """Rows are rendered once until their status or text changes"""
+        cache = FragmentCache()
+        rows = [(1, "Buy milk", "pending"), (2, "Read book", "completed")]
+
+        first = cache.render_list(rows)
+        second = cache.render_list(rows)
+        changed = cache.render_list([(1, "Buy milk", "completed"), rows[1]])
+
+        assert first == second
+        assert b"Mark Complete" not in changed
+        counters = metrics.snapshot()["counters"]
+        assert counters["list_fragments_rendered_total"] == 3
+        assert counters["list_fragments_cached_total"] == 3
+
+    def test_fragment_cache_is_bounded(self):
+        """The least recently used rows are evicted past maxsize"""
+        cache = FragmentCache(maxsize=2)
+        cache.render_list([(i, f"Task {i}", "pending") for i in range(1, 4)])
+        assert len(cache._rows) == 2
+
+
+class TestTaskStore:
+    """Test the in-memory task store and its write-through"""
+
+    ROWS = [
+        ("default", 1, "Buy milk", "pending"),
+        ("default", 2, "Read book", "completed"),
+        ("team-b", 3, "Team B task", "pending"),
+        ("default", 4, "Walk", "pending"),
+    ]
+
+    def setup_method(self):
+        metrics.reset()
+
+    def warm_store(self):
+        store = TaskStore(lambda: [list(self.ROWS)])
+        store.refresh()
+        return store
+
+    def test_index_pages_by_status(self):
+        """Pages come back in id order, overall and per status"""
+        index = TaskIndex()
+        for _, task_id, task, status in reversed(self.ROWS):
+            index.put(task_id, task, status)
+        assert [t["id"] for t in index.page(None, 2, 1)] == [2, 3]
+        assert index.page("pending", 10, 0) == [
+            {"id": 1, "task": "Buy milk", "status": "pending"},
+            {"id": 3, "task": "Team B task", "status": "pending"},
+            {"id": 4, "task": "Walk", "status": "pending"},
+        ]
+        index.set_status(1, "completed")
+        index.remove(4)
+        index.remove(3)
+        assert index.counts() == {"pending": 0, "completed": 2, "archived": 0}
+        assert index.rows() == [
+            (1, "Buy milk", "completed"),
+            (2, "Read book", "completed"),
+        ]
+        assert index.set_status(4, "pending") is False
+
+    def test_store_is_partitioned_by_owner(self):
+        """Each owner only sees their own tasks and counts"""
+        store = self.warm_store()
+        assert store.rows("team-b") == [(3, "Team B task", "pending")]
+        assert store.counts("default")["pending"] == 2
+        assert store.page("nobody", None, 10, 0) == []
+        assert store.remove("team-b", 1) is False
+
+    def test_refresh_replays_concurrent_writes(self):
+        """Writes made while a reload streams are not lost by the swap"""
+        store = self.warm_store()
+
+        def load_rows():
+            yield [("default", 1, "Buy milk", "pending")]
+            store.put("default", 5, "New task", "pending")
+            store.remove("default", 1)
+            yield [("default", 2, "Read book", "completed")]
+
+        store._load_rows = load_rows
+        store.refresh()
+        assert store.rows("default") == [
+            (2, "Read book", "completed"),
+            (5, "New task", "pending"),
+        ]
+
+    def test_refresh_counts_drift(self):
+        """Reconciliation picks up and counts out-of-band changes"""
+        store = self.warm_store()
+        store._load_rows = lambda: [
+            [
+                ("default", 1, "Buy milk", "archived"),
+                ("default", 2, "Read book", "completed"),
+            ]
+        ]
+        assert store.refresh() == 3
+        assert metrics.snapshot()["counters"]["task_store_drift_total"] == 3
+        assert store.counts("default")["archived"] == 1
+        assert store.rows("team-b") == []
+
+    @patch("app.get_db")
+    def test_reads_served_from_store(self, mock_db, client):
+        """/tasks and /list skip MySQL once the store is warm"""
+        with patch.dict(app.config, {"TASK_STORE_ENABLED": True}), patch.dict(
+            app.extensions, {"task_store": self.warm_store()}
+        ):
+            response = client.get("/tasks?status=pending&total=true&per_page=1")
+            page = client.get("/list")
+            other = client.get("/tasks", headers={"X-Owner-Id": "team-b"})
+
+        mock_db.assert_not_called()
+        data = json.loads(response.data)
+        assert data["tasks"] == [{"id": 1, "task": "Buy milk", "status": "pending"}]
+        assert data["total"] == 2
+        assert b"Read book" in page.data and b"Team B task" not in page.data
+        assert [t["id"] for t in json.loads(other.data)["tasks"]] == [3]
+
+    @patch("app.get_db")
+    def test_cold_store_falls_back_to_mysql(self, mock_db, client):
+        """Until the first load completes reads still go to MySQL"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = []
+        mock_db.side_effect = make_db_context(cursor)
+        with patch.dict(app.config, {"TASK_STORE_ENABLED": True}), patch.dict(
+            app.extensions, {"task_store": TaskStore(lambda: [])}
+        ):
+            response = client.get("/tasks")
+
+        assert response.status_code == 200
+        assert mock_db.called
+
+    @patch("app.get_db")
+    def test_mutations_write_through(self, mock_db, client):
+        """/add, /complete and /delete update the store after MySQL"""
+        cursor = MagicMock()
+        cursor.lastrowid = 7
+        cursor.fetchone.return_value = (1,)
+        mock_db.side_effect = make_db_context(cursor)
+        store = self.warm_store()
+        with patch.dict(app.config, {"TASK_STORE_ENABLED": True}), patch.dict(
+            app.extensions, {"task_store": store}
+        ):
+            client.post("/add", json={"task": "Fresh"})
+            client.post("/complete/1")
+            client.post("/delete/2")
+
+        assert store.rows("default") == [
+            (1, "Buy milk", "completed"),
+            (4, "Walk", "pending"),
+            (7, "Fresh", "pending"),
+        ]
+
+
 class TestTasksAPIEndpoint:
     """Test /tasks endpoint (JSON API with pagination)"""
 
@@ -201,6 +1074,21 @@ class TestTasksAPIEndpoint:
         assert "tasks" in data
         assert "page" in data
 
+    def test_tasks_api_with_total(self, client):
+        """Test total=true adds the counter-backed total for the filter"""
+        cursor = MagicMock()
+        cursor.fetchall.side_effect = [
+            [{"id": 1, "task": "Buy milk", "status": "pending"}],
+            [("pending", 4), ("completed", 2)],
+        ]
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.get("/tasks?status=pending&total=true")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["count"] == 1
+        assert data["total"] == 4
+
     def test_tasks_api_invalid_page(self, client):
         """Test tasks API with invalid page number"""
         response = client.get("/tasks?page=0")
@@ -212,6 +1100,395 @@ class TestTasksAPIEndpoint:
         assert response.status_code == 400
 
 
+class TestTaskStatsEndpoint:
+    """Test /tasks/stats endpoint (per-status counters)"""
+
+    def test_stats_success(self, client):
+        """Counts come from the summary table, with missing statuses as zero"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [("pending", 3), ("completed", 5)]
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.get("/tasks/stats")
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["counts"] == {"pending": 3, "completed": 5, "archived": 0}
+        assert data["total"] == 8
+        assert cursor.execute.call_args[0][0] == SELECT_TASK_COUNTS
+
+    def test_stats_db_error(self, client):
+        """Test stats endpoint with database error"""
+        with patch("app.get_db", side_effect=MySQLError("Connection error")):
+            response = client.get("/tasks/stats")
+
+        assert response.status_code == 500
+        assert json.loads(response.data)["error"] == "Database error"
+
+
+class TestTaskPriorities:
+    """Test priority/due_at fields and the /tasks/next endpoint"""
+
+    def test_parse_priority(self):
+        """Priorities are 0-9; blank means the default"""
+        assert parse_priority(None) == 0
+        assert parse_priority("") == 0
+        assert parse_priority("7") == 7
+        assert parse_priority(9) == 9
+        for value in (10, -1, "high", 2.5, True):
+            with pytest.raises(ValueError):
+                parse_priority(value)
+
+    def test_parse_due_at(self):
+        """ISO 8601 dates are normalised to naive UTC; blank means none"""
+        assert parse_due_at(None) == NO_DUE_DATE
+        assert parse_due_at("2026-03-01").isoformat() == "2026-03-01T00:00:00"
+        assert (
+            parse_due_at("2026-03-01T12:30:00+02:00").isoformat()
+            == "2026-03-01T10:30:00"
+        )
+        assert format_due_at(NO_DUE_DATE) is None
+        for value in (
+            "tomorrow",
+            20260301,
+            "9999-12-31T23:59:59",
+            # UTC equivalents overflow datetime's range
+            "9999-12-31T23:00:00-05:00",
+            "0001-01-01T00:00:00+05:00",
+        ):
+            with pytest.raises(ValueError):
+                parse_due_at(value)
+
+    @patch("app.get_db")
+    def test_add_accepts_priority_and_due_at(self, mock_db, client):
+        """/add stores the optional fields and echoes them back"""
+        cursor = MagicMock()
+        cursor.lastrowid = 3
+        mock_db.side_effect = make_db_context(cursor)
+
+        response = client.post(
+            "/add",
+            json={"task": "File taxes", "priority": 8, "due_at": "2026-04-15"},
+        )
+
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data["priority"] == 8
+        assert data["due_at"] == "2026-04-15T00:00:00"
+        params = cursor.execute.call_args[0][1]
+        assert params[3:] == (8, parse_due_at("2026-04-15"))
+
+    def test_add_rejects_bad_priority(self, client):
+        """An out-of-range priority is a validation error"""
+        with patch("app.get_db") as mock_get_db:
+            response = client.post("/add", json={"task": "x", "priority": 42})
+            mock_get_db.assert_not_called()
+        assert response.status_code == 400
+
+    def test_import_reads_optional_columns(self):
+        """CSV priority and due_at columns reach the INSERT"""
+        data = b"task,priority,due_at\r\nUrgent,9,2026-01-02\r\nLater,,\r\n"
+        cursor = MagicMock()
+        importer = BulkImporter(make_db_context(cursor), validate_task)
+        importer.run(records_for(io.BytesIO(data), "csv"))
+
+        rows = cursor.executemany.call_args[0][1]
+        assert rows == [
+            ("default", "Urgent", "pending", 9, parse_due_at("2026-01-02")),
+            ("default", "Later", "pending", 0, NO_DUE_DATE),
+        ]
+
+    @patch("app.get_db")
+    def test_next_tasks(self, mock_db, client):
+        """/tasks/next returns the top n pending tasks from the ordered index"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            {
+                "id": 4,
+                "task": "Urgent",
+                "status": "pending",
+                "priority": 9,
+                "due_at": parse_due_at("2026-01-02"),
+            },
+            {
+                "id": 2,
+                "task": "Someday",
+                "status": "pending",
+                "priority": 9,
+                "due_at": NO_DUE_DATE,
+            },
+        ]
+        mock_db.side_effect = make_db_context(cursor)
+
+        response = client.get("/tasks/next?n=2", headers={"X-Owner-Id": "team-a"})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["count"] == 2
+        assert [t["due_at"] for t in data["tasks"]] == ["2026-01-02T00:00:00", None]
+        query, params = cursor.execute.call_args[0]
+        assert "ORDER BY priority DESC, due_at, id LIMIT %s" in query
+        assert params == ("team-a", 2)
+
+    def test_next_tasks_validates_n(self, client):
+        """n must be between 1 and 100"""
+        assert client.get("/tasks/next?n=0").status_code == 400
+        assert client.get("/tasks/next?n=101").status_code == 400
+
+
+class TestExportEndpoint:
+    """Test /tasks/export streaming endpoint"""
+
+    ROWS = [(1, 'Say "hi"', "pending"), (2, "a,b\nc", "completed")]
+
+    def test_ndjson_encoding_escapes_text(self):
+        """NDJSON lines are valid JSON even with quotes and newlines"""
+        data = b"".join(encode_stream(NDJSONEncoder(), [self.ROWS]))
+        lines = data.decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"id": 1, "task": 'Say "hi"', "status": "pending"},
+            {"id": 2, "task": "a,b\nc", "status": "completed"},
+        ]
+
+    def test_csv_encoding_has_header_and_quoting(self):
+        """CSV starts with a header row and quotes awkward fields"""
+        data = b"".join(encode_stream(CSVEncoder(), [self.ROWS[:1], self.ROWS[1:]]))
+        rows = list(csv.reader(io.StringIO(data.decode())))
+        assert rows[0] == ["id", "task", "status"]
+        assert rows[2] == ["2", "a,b\nc", "completed"]
+
+    def test_arrow_encoding_round_trips(self):
+        """Arrow IPC stream can be read back as one table"""
+        pyarrow = pytest.importorskip("pyarrow")
+        from export import ArrowEncoder
+
+        data = b"".join(encode_stream(ArrowEncoder(), [self.ROWS, self.ROWS]))
+        table = pyarrow.ipc.open_stream(data).read_all()
+        assert table.num_rows == 4
+        assert table.column("task").to_pylist()[0] == 'Say "hi"'
+
+    def test_export_query_keyset_and_filter(self):
+        """since_id and status become a keyset WHERE clause ordered by id"""
+        query, params = export_query("team-a", "pending", 42)
+        assert "owner_id = %s AND id > %s" in query and "status = %s" in query
+        assert query.endswith("ORDER BY id")
+        assert params == ["team-a", 42, "pending"]
+
+    def test_export_streams_chunks(self, client):
+        """The endpoint streams every chunk from the unbuffered cursor"""
+        cursor = MagicMock()
+        cursor.fetchmany.side_effect = [self.ROWS[:1], self.ROWS[1:], []]
+        with patch("app.get_streaming_db", make_db_context(cursor)):
+            response = client.get("/tasks/export?format=ndjson&since_id=0")
+            body = response.get_data()
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.headers["X-Accel-Buffering"] == "no"
+        assert len(body.splitlines()) == 2
+        cursor.execute.assert_called_once()
+
+    def test_export_csv_empty_table(self, client):
+        """An empty export still returns the CSV header"""
+        cursor = MagicMock()
+        cursor.fetchmany.return_value = []
+        with patch("app.get_streaming_db", make_db_context(cursor)):
+            response = client.get("/tasks/export?format=csv")
+
+        assert response.status_code == 200
+        assert response.get_data() == b"id,task,status\r\n"
+
+    def test_export_invalid_format(self, client):
+        """Unknown formats are rejected"""
+        response = client.get("/tasks/export?format=xml")
+        assert response.status_code == 400
+
+    def test_export_invalid_status(self, client):
+        """Unknown status filters are rejected"""
+        response = client.get("/tasks/export?status=done")
+        assert response.status_code == 400
+
+    def test_export_db_error(self, client):
+        """Connection errors surface as 500 before streaming starts"""
+        with patch("app.get_streaming_db", side_effect=MySQLError("down")):
+            response = client.get("/tasks/export")
+
+        assert response.status_code == 500
+        assert json.loads(response.data)["error"] == "Database error"
+
+
+class TestBulkImport:
+    """Test streamed NDJSON/CSV bulk import (library, endpoint and CLI)"""
+
+    NDJSON = (
+        b'{"task": "Buy milk"}\n'
+        b"\n"
+        b'{"task": "Read book", "status": "completed"}\n'
+        b"not json\n"
+        b'{"task": "   "}\n'
+    )
+    CSV = (
+        b'task,status\r\nBuy milk,pending\r\n"Two\r\nlines",archived\r\nSleep,done\r\n'
+    )
+
+    def test_ndjson_offsets_track_bytes(self):
+        """Each record carries the byte offset just past its line"""
+        records = list(iter_ndjson_records(io.BytesIO(self.NDJSON)))
+        assert len(records) == 4
+        assert records[0] == ({"task": "Buy milk"}, 21)
+        assert records[-1][1] == len(self.NDJSON)
+
+    def test_csv_offsets_with_multiline_field(self):
+        """CSV offsets stay exact when a quoted field spans lines"""
+        records = list(records_for(io.BytesIO(self.CSV), "csv"))
+        assert [r for r, _ in records][1] == {
+            "task": "Two\r\nlines",
+            "status": "archived",
+        }
+        assert records[1][1] == self.CSV.index(b"Sleep")
+        assert records[-1][1] == len(self.CSV)
+
+    def test_csv_requires_task_column(self):
+        """A CSV without a task column is rejected up front"""
+        with pytest.raises(ValueError):
+            records_for(io.BytesIO(b"name\r\nx\r\n"), "csv")
+
+    def test_validate_batch_collects_errors(self):
+        """Invalid records are reported, valid ones are kept"""
+        records = records_for(io.BytesIO(self.NDJSON), "ndjson")
+        rows, errors = validate_batch(
+            [(n, r) for n, (r, _) in enumerate(records, 1)], validate_task
+        )
+        assert rows == [
+            ("Buy milk", "pending", 0, NO_DUE_DATE),
+            ("Read book", "completed", 0, NO_DUE_DATE),
+        ]
+        assert [n for n, _ in errors] == [3, 4]
+
+    def test_importer_batches_and_checkpoints(self, tmp_path):
+        """Rows are inserted per batch with executemany and progress is saved"""
+        cursor = MagicMock()
+        checkpoint = Checkpoint(str(tmp_path / "import.ckpt"))
+        importer = BulkImporter(
+            make_db_context(cursor), validate_task, batch_size=2, checkpoint=checkpoint
+        )
+
+        state = importer.run(records_for(io.BytesIO(self.NDJSON), "ndjson"))
+
+        assert cursor.executemany.call_count == 1
+        assert state["imported"] == 2 and state["rejected"] == 2
+        assert checkpoint.load()["offset"] == len(self.NDJSON)
+
+    def test_importer_resumes_from_checkpoint(self, tmp_path):
+        """A saved offset skips the lines that were already committed"""
+        checkpoint = Checkpoint(str(tmp_path / "import.ckpt"))
+        checkpoint.save({"offset": 21, "records": 1, "imported": 1, "rejected": 0})
+        cursor = MagicMock()
+        importer = BulkImporter(
+            make_db_context(cursor), validate_task, checkpoint=checkpoint
+        )
+
+        offset = importer.resume_state()
+        importer.run(records_for(io.BytesIO(self.NDJSON), "ndjson", offset))
+
+        rows = cursor.executemany.call_args[0][1]
+        assert rows == [("default", "Read book", "completed", 0, NO_DUE_DATE)]
+        assert importer.state["imported"] == 2
+
+    def test_import_endpoint(self, client):
+        """The endpoint streams the body and reports what was loaded"""
+        cursor = MagicMock()
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.post(
+                "/tasks/import?format=csv&batch_size=2", data=self.CSV
+            )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["imported"] == 2
+        assert data["rejected"] == 1
+        assert data["bytes_committed"] == len(self.CSV)
+        assert data["errors"][0]["record"] == 3
+
+    def test_import_endpoint_db_error_reports_progress(self, client):
+        """A DB failure returns 500 with how far the import got"""
+        with patch("app.get_db", side_effect=MySQLError("down")):
+            response = client.post("/tasks/import", data=self.NDJSON)
+
+        assert response.status_code == 500
+        data = json.loads(response.data)
+        assert data["error"] == "Database error"
+        assert data["bytes_committed"] == 0
+
+    def test_import_endpoint_decode_error_reports_progress(self, client):
+        """Errors after a committed batch still say where to resume"""
+        body = self.CSV[: self.CSV.index(b"Sleep")] + b"Bad \xff byte\r\n"
+        cursor = MagicMock()
+        with patch("app.get_db", make_db_context(cursor)), patch(
+            "app.refresh_task_store"
+        ) as refresh:
+            response = client.post("/tasks/import?format=csv&batch_size=2", data=body)
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert "utf-8" in data["error"]
+        assert data["imported"] == 2
+        assert data["bytes_committed"] == self.CSV.index(b"Sleep")
+        refresh.assert_called_once_with()
+
+    def test_import_endpoint_resumes_at_offset(self, client):
+        """offset skips committed bytes and re-reads the CSV header"""
+        cursor = MagicMock()
+        offset = self.CSV.index(b"Sleep")
+        body = self.CSV.replace(b"Sleep,done", b"Sleep,pending")
+        with patch("app.get_db", make_db_context(cursor)):
+            response = client.post(
+                f"/tasks/import?format=csv&offset={offset}", data=body
+            )
+
+        assert response.status_code == 200
+        rows = cursor.executemany.call_args[0][1]
+        assert rows == [("default", "Sleep", "pending", 0, NO_DUE_DATE)]
+        assert json.loads(response.data)["bytes_committed"] == len(body)
+
+    def test_import_rejects_out_of_range_due_at(self):
+        """An overflowing due_at rejects its record, not the whole batch"""
+        records = [(1, {"task": "a", "due_at": "9999-12-31T23:00:00-05:00"})]
+        records.append((2, {"task": "b"}))
+        rows, errors = validate_batch(records, validate_task)
+        assert [row[0] for row in rows] == ["b"]
+        assert errors == [(1, "due_at is out of range")]
+
+    def test_import_endpoint_invalid_format(self, client):
+        """Unknown formats are rejected"""
+        response = client.post("/tasks/import?format=xml", data=b"")
+        assert response.status_code == 400
+
+    def test_cli_imports_file_and_clears_checkpoint(self, tmp_path):
+        """The CLI loads a file and removes its checkpoint when done"""
+        path = tmp_path / "tasks.ndjson"
+        path.write_bytes(self.NDJSON)
+        cursor = MagicMock()
+        with patch("app.get_db", make_db_context(cursor)):
+            assert bulk_import_main([str(path)]) == 0
+
+        assert cursor.executemany.call_count == 1
+        assert not (tmp_path / "tasks.ndjson.checkpoint").exists()
+
+    def test_cli_reuses_app_and_its_default_owner(self, tmp_path):
+        """The CLI imports into the configured owner without a second app"""
+        path = tmp_path / "tasks.ndjson"
+        path.write_bytes(self.NDJSON)
+        cursor = MagicMock()
+        with patch("app.get_db", make_db_context(cursor)), patch(
+            "app.create_app"
+        ) as factory, patch.dict(app.config, {"DEFAULT_OWNER": "ops"}):
+            assert bulk_import_main([str(path)]) == 0
+
+        factory.assert_not_called()
+        rows = cursor.executemany.call_args[0][1]
+        assert {row[0] for row in rows} == {"ops"}
+
+
 class TestCompleteEndpoint:
     """Test /complete/<id> endpoint"""
 
@@ -1,6 +1,9 @@
-import requests
+import os
 import time
 
+import pytest
+import requests
+
 
 def test_complete_user_journey():
     """
@@ -71,3 +74,34 @@ def test_health_check():
     assert "healthy" in content
 
     print("Health check test passed")
+
+
+def test_nginx_micro_cache():
+    """Test the scale-out nginx profile caches /tasks reads per owner"""
+    base_url = os.environ.get("NGINX_URL", "http://nginx")
+    url = f"{base_url}/tasks?per_page=5&e2e={int(time.time() * 1000)}"
+
+    first = requests.get(url, headers={"X-Owner-Id": "e2e-a"})
+    assert first.status_code == 200
+    if "X-Cache-Status" not in first.headers:
+        pytest.skip("nginx is not running the scale-out profile")
+    assert first.headers["X-Cache-Status"] == "MISS"
+
+    second = requests.get(url, headers={"X-Owner-Id": "e2e-a"})
+    assert second.headers["X-Cache-Status"] == "HIT"
+    assert second.json() == first.json()
+
+    # Another owner's list must never come from e2e-a's cache entry
+    other = requests.get(url, headers={"X-Owner-Id": "e2e-b"})
+    assert other.headers["X-Cache-Status"] == "MISS"
+
+    # Writes always reach Flask and are never cached
+    response = requests.post(
+        f"{base_url}/add",
+        json={"task": "E2E cache bypass"},
+        headers={"X-Owner-Id": "e2e-a"},
+    )
+    assert response.status_code == 201
+    assert "X-Cache-Status" not in response.headers
+
+    print("Micro-cache test passed")